@@ -0,0 +1,339 @@
+import os
+import gzip
+import json
+import time
+import atexit
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Counter, Gauge, Histogram
+
+import tracing
+from tracing import TRACE_HEADER
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+DELIVERY_GZIP      = os.getenv("DELIVERY_GZIP", "1") != "0"
+GZIP_MIN_BYTES     = int(os.getenv("DELIVERY_GZIP_MIN_BYTES", "1024"))
+POOL_SIZE          = int(os.getenv("DELIVERY_POOL_SIZE", "10"))
+
+# > 0 merges fire-and-forget payloads for the same endpoint and source
+# into one request, sent once the source has been quiet for this many
+# seconds (or has been held COALESCE_MAX_SECONDS, or has
+# COALESCE_MAX_CREDS creds). Above COALESCE_MAX_BUFFERED creds buffered
+# in total, the oldest sources are sent early.
+COALESCE_SECONDS      = float(os.getenv("DELIVERY_COALESCE_SECONDS", "0"))
+COALESCE_MAX_SECONDS  = float(os.getenv("DELIVERY_COALESCE_MAX_SECONDS", "300"))
+COALESCE_MAX_CREDS    = int(os.getenv("DELIVERY_COALESCE_MAX_CREDS", "1000"))
+COALESCE_MAX_BUFFERED = int(os.getenv("DELIVERY_COALESCE_MAX_BUFFERED", "50000"))
+
+# =========================================================
+# METRICS
+# =========================================================
+
+FORWARD_REQUESTS = Counter(
+    "delivery_requests_total",
+    "Outbound POSTs by endpoint and status code", ["endpoint", "status"]
+)
+FORWARD_SECONDS = Histogram(
+    "delivery_request_seconds",
+    "Outbound POST latency", ["endpoint"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+)
+FORWARD_BYTES = Counter(
+    "delivery_bytes_sent_total",
+    "Request body bytes sent (after gzip)", ["endpoint"]
+)
+
+# =========================================================
+# PAYLOAD HELPERS
+# =========================================================
+
+class Batch:
+    """
+    Alert payloads for one source, merged as they arrive: emails and
+    (email, password) pairs are deduplicated in place, so adding a
+    payload costs its own size, not the size of the batch. The trace ids
+    of the merged payloads are kept (with when each arrived) and sent as
+    "trace_ids".
+    """
+
+    MERGED = ("emails", "creds", "trace_id", "trace_ids")
+
+    def __init__(self, payload: dict, timeout: float):
+        self.base = {k: v for k, v in payload.items() if k not in self.MERGED}
+        self.emails = set()
+        self.creds = {}
+        self.traces = {}
+        self.timeout = timeout
+        self.first = time.monotonic()
+        self.payloads = 0
+        self.add(payload)
+
+    def add(self, payload: dict) -> None:
+        self.emails.update(payload.get("emails") or [])
+        for c in payload.get("creds") or []:
+            self.creds[(c.get("email"), c.get("password"))] = c
+        self.last = time.monotonic()
+        for trace in [payload.get("trace_id")] + list(payload.get("trace_ids") or []):
+            if trace:
+                self.traces.setdefault(trace, self.last)
+        self.payloads += 1
+
+    def payload(self) -> dict:
+        merged = dict(self.base)
+        merged["emails"] = sorted(self.emails)
+        merged["email_count"] = len(self.emails)
+        if self.creds:
+            merged["creds"] = list(self.creds.values())
+            merged["cred_count"] = len(self.creds)
+        if self.traces:
+            merged["trace_ids"] = list(self.traces)
+            if len(self.traces) == 1:
+                merged["trace_id"] = next(iter(self.traces))
+        return merged
+
+def json_body(request) -> dict:
+    """get_json() for Flask requests that may carry a gzip body."""
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        try:
+            return json.loads(gzip.decompress(request.get_data()))
+        except Exception:
+            return {}
+    return request.get_json(silent=True) or {}
+
+def endpoint_name(url: str) -> str:
+    # scheme://host/path only; webhook query strings may hold secrets
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+# =========================================================
+# DELIVERY CLIENT
+# =========================================================
+#
+# One pooled requests.Session per process: keep-alive connections are
+# reused across alerts, JSON bodies above GZIP_MIN_BYTES are gzipped,
+# and every endpoint gets request / byte / latency / status counters.
+#
+# post() is synchronous and returns the response (for callers that act
+# on the status). send() is fire-and-forget: with COALESCE_SECONDS set
+# it buffers payloads per (endpoint, source) and a background thread
+# sends each merged payload once its source goes quiet. Whatever is
+# still buffered is sent at interpreter exit. send() logs a "delivered"
+# event per trace id with the time it was held (hold_s) and the POST
+# time (post_s).
+
+class DeliveryClient:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._pending = {}
+        self._flusher = None
+
+    # ---------------------------------------------------------
+    # sending
+    # ---------------------------------------------------------
+
+    def post(self, url: str, payload: dict, timeout: float = 15) -> requests.Response:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        raw_len = len(body)
+        headers = {"Content-Type": "application/json"}
+        if payload.get("trace_id"):
+            headers[TRACE_HEADER] = str(payload["trace_id"])
+
+        if DELIVERY_GZIP and raw_len >= GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+
+        t0 = time.perf_counter()
+        try:
+            r = self.session.post(url, data=body, headers=headers, timeout=timeout)
+        except Exception:
+            self._record(url, None, time.perf_counter() - t0, raw_len, len(body))
+            raise
+
+        self._record(url, r.status_code, time.perf_counter() - t0, raw_len, len(body))
+        return r
+
+    def send(self, url: str, payload: dict, timeout: float = 15):
+        """
+        Deliver without caring about the response. Returns the response
+        when sent immediately, None when the payload was buffered.
+        """
+        if COALESCE_SECONDS <= 0:
+            t0 = time.perf_counter()
+            try:
+                r = self.post(url, payload, timeout)
+            except Exception as e:
+                self._trace(url, payload.get("source"), {payload.get("trace_id"): None},
+                            None, t0, error=str(e))
+                raise
+            self._trace(url, payload.get("source"), {payload.get("trace_id"): None},
+                        r.status_code, t0)
+            return r
+
+        key = (url, payload.get("source"))
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                self._pending[key] = batch = Batch(payload, timeout)
+            else:
+                batch.add(payload)
+                self._stat(url)["coalesced"] += 1
+
+            due = [key] if len(batch.creds) >= COALESCE_MAX_CREDS else []
+            due += self._over_budget()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+
+        for k in due:
+            self._flush_key(k)
+        return None
+
+    def _over_budget(self) -> list:
+        """Oldest batches to send now to get back under COALESCE_MAX_BUFFERED."""
+        total = sum(len(b.creds) for b in self._pending.values())
+        due = []
+        for key, batch in sorted(self._pending.items(), key=lambda kv: kv[1].first):
+            if total <= COALESCE_MAX_BUFFERED:
+                break
+            due.append(key)
+            total -= len(batch.creds)
+        return due
+
+    def flush(self) -> None:
+        """Send everything still buffered."""
+        with self._lock:
+            keys = list(self._pending)
+        for key in keys:
+            self._flush_key(key)
+
+    def _flush_key(self, key) -> None:
+        with self._lock:
+            batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+
+        url, source = key
+        payload = batch.payload()
+        t0 = time.perf_counter()
+        try:
+            r = self.post(url, payload, batch.timeout)
+            self._trace(url, source, batch.traces, r.status_code, t0)
+            print(
+                f"[delivery] sent {payload.get('cred_count', 0)} cred(s) "
+                f"from {batch.payloads} payload(s) "
+                f"for {source} to {endpoint_name(url)} (status {r.status_code})",
+                flush=True
+            )
+        except Exception as e:
+            self._trace(url, source, batch.traces, None, t0, error=str(e))
+            print(f"[delivery] send failed for {source}: {e}", flush=True)
+
+    def _trace(self, url, source, traces: dict, status, t0: float, **fields) -> None:
+        """One "delivered" event per trace id (trace -> monotonic arrival time)."""
+        post_s = time.perf_counter() - t0
+        sent = time.monotonic() - post_s
+        for trace, added in traces.items():
+            if not trace:
+                continue
+            tracing.event(
+                "delivered", trace, endpoint=endpoint_name(url), source=source,
+                status=status, hold_s=sent - added if added else 0.0,
+                post_s=post_s, **fields
+            )
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(max(COALESCE_SECONDS / 4, 0.05))
+            now = time.monotonic()
+            with self._lock:
+                due = [
+                    k for k, b in self._pending.items()
+                    if now - b.last >= COALESCE_SECONDS
+                    or now - b.first >= COALESCE_MAX_SECONDS
+                ]
+            for key in due:
+                self._flush_key(key)
+
+    # ---------------------------------------------------------
+    # counters
+    # ---------------------------------------------------------
+
+    def _stat(self, url: str) -> dict:
+        name = endpoint_name(url)
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = {
+                "requests": 0,
+                "errors": 0,
+                "coalesced": 0,
+                "status": {},
+                "bytes_json": 0,
+                "bytes_sent": 0,
+                "latency_sum": 0.0,
+                "latency_max": 0.0,
+            }
+        return st
+
+    def _record(self, url, status, latency, raw_len, sent_len) -> None:
+        with self._lock:
+            st = self._stat(url)
+            st["requests"] += 1
+            if status is None or status >= 400:
+                st["errors"] += 1
+            code = str(status) if status is not None else "error"
+            st["status"][code] = st["status"].get(code, 0) + 1
+            st["bytes_json"] += raw_len
+            st["bytes_sent"] += sent_len
+            st["latency_sum"] += latency
+            st["latency_max"] = max(st["latency_max"], latency)
+
+        name = endpoint_name(url)
+        FORWARD_REQUESTS.labels(name, code).inc()
+        FORWARD_SECONDS.labels(name).observe(latency)
+        FORWARD_BYTES.labels(name).inc(sent_len)
+
+    def pending(self) -> int:
+        """Coalesced payloads waiting to be sent."""
+        with self._lock:
+            return len(self._pending)
+
+    def buffered(self) -> int:
+        """Creds held in coalescing buffers."""
+        with self._lock:
+            return sum(len(b.creds) for b in self._pending.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for name, st in self._stats.items():
+                st = dict(st, status=dict(st["status"]))
+                n = st["requests"]
+                st["latency_avg"] = st["latency_sum"] / n if n else 0.0
+                st["bytes_per_second"] = st["bytes_sent"] / st["latency_sum"] if st["latency_sum"] else 0.0
+                out[name] = st
+            return out
+
+# singleton-style client, matches `from delivery import client`
+client = DeliveryClient()
+atexit.register(client.flush)
+
+Gauge(
+    "delivery_pending_payloads",
+    "Coalesced payloads waiting for their window to expire"
+).set_function(client.pending)
+Gauge(
+    "delivery_buffered_creds",
+    "Creds held in coalescing buffers"
+).set_function(client.buffered)
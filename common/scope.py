@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import hashlib
+import threading
+
+# =========================================================
+# CONFIG
+# =========================================================
+#
+# Rules come from the environment and, optionally, a rules file that is
+# re-read when it changes (no restart needed):
+#
+#   SCOPE_DOMAIN   comma-separated domains (TARGET_DOMAIN is read too)
+#   SCOPE_EMAIL    comma-separated substrings of watched addresses
+#   SCOPE_FILE     one rule per line:
+#
+#     example.edu             addresses @example.edu only
+#     @example.org            same, for a domain
+#     domain:example.net      same, explicit
+#     *.example.edu           example.edu and all its subdomains
+#     ceo@example.com         exact address
+#     email:cfo@example.com   same, explicit
+#     contains:j.doe          substring of the address
+#     # comment
+#
+# An address is in scope if any rule matches it. With no rules at all,
+# everything is in scope.
+
+SCOPE_FILE = os.getenv("SCOPE_FILE", "")
+SCOPE_RELOAD_SECONDS = float(os.getenv("SCOPE_RELOAD_SECONDS", "5"))
+
+# Up to this many literal needles, scanners skip the lines that contain
+# none of them before running the credential regexes
+SCOPE_PREFILTER_MAX = int(os.getenv("SCOPE_PREFILTER_MAX", "16"))
+
+# Per-domain verdicts remembered by each rule set
+DOMAIN_CACHE_MAX = 100_000
+
+def _env_list(name: str) -> list:
+    return [v.strip().lower() for v in os.getenv(name, "").split(",") if v.strip()]
+
+# =========================================================
+# MATCHING
+# =========================================================
+
+def _trie_pattern(words) -> str:
+    """
+    Regex matching any of `words`, shaped as a trie so a search costs
+    about the same for ten thousand words as for ten.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = None
+
+    def build(node) -> str:
+        # a word ends here: anything containing a longer one contains it too
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+class Scope:
+    """
+    One immutable rule set. allowed() is a set lookup for exact
+    addresses and domains and, for a domain not seen before with
+    wildcard rules, one set lookup per label (a.b.example.edu ->
+    a.b.example.edu, b.example.edu, example.edu, edu); verdicts are
+    cached per domain. Those costs do not grow with the number of rules.
+    Substring rules are one trie-regex search per address, which does:
+    each alternative at each position is still tried in turn.
+    """
+
+    def __init__(self, domains=(), emails=(), substrings=()):
+        domains = [d.lower().lstrip("@") for d in domains if d]
+        # "*.example.edu": the domain and its subdomains
+        self.wildcards = frozenset(d[2:] for d in domains if d.startswith("*."))
+        self.domains = frozenset(
+            d.lstrip(".") for d in domains if not d.startswith("*.")
+        ) | self.wildcards
+        self.emails = frozenset(e.lower() for e in emails if e)
+        self.substrings = frozenset(s.lower() for s in substrings if s)
+        self.empty = not (self.domains or self.emails or self.substrings)
+
+        # dumps repeat a few domains over and over: remember the verdicts
+        self._verdicts = {}
+
+        self._contains = None
+        if self.substrings:
+            self._contains = re.compile(_trie_pattern(self.substrings)).search
+
+        rules = sorted(
+            [f"domain:{d}" for d in self.domains - self.wildcards]
+            + [f"domain:*.{d}" for d in self.wildcards]
+            + [f"email:{e}" for e in self.emails]
+            + [f"contains:{s}" for s in self.substrings]
+        )
+        # "exact:" marks digests from after plain domains stopped matching
+        # subdomains, so results cached under the wider reading are dropped
+        self.digest = hashlib.sha256("\n".join(["exact:"] + rules).encode()).hexdigest()[:16]
+
+        # literals every in-scope address contains, for line prefilters
+        needles = self.domains | self.emails | self.substrings
+        self.needles = None
+        self.needle_re = None
+        if needles and len(needles) <= SCOPE_PREFILTER_MAX:
+            self.needles = tuple(sorted(n.encode() for n in needles))
+            self.needle_re = re.compile(b"|".join(re.escape(n) for n in self.needles))
+
+    def __len__(self) -> int:
+        return len(self.domains) + len(self.emails) + len(self.substrings)
+
+    def allowed(self, email: str) -> bool:
+        """`email` (lower case) is in scope."""
+        if self.empty:
+            return True
+        if email in self.emails:
+            return True
+
+        if self.domains:
+            domain = email.rpartition("@")[2]
+            hit = self._verdicts.get(domain)
+            if hit is None:
+                hit = self._domain_allowed(domain)
+                if len(self._verdicts) >= DOMAIN_CACHE_MAX:
+                    self._verdicts.clear()
+                self._verdicts[domain] = hit
+            if hit:
+                return True
+
+        if self._contains is not None and self._contains(email):
+            return True
+        return False
+
+    def _domain_allowed(self, domain: str) -> bool:
+        if domain in self.domains:
+            return True
+        while self.wildcards:
+            dot = domain.find(".")
+            if dot < 0:
+                return False
+            domain = domain[dot + 1:]
+            if domain in self.wildcards:
+                return True
+        return False
+
+def parse_rules(lines) -> tuple[list, list, list]:
+    domains, emails, substrings = [], [], []
+    for line in lines:
+        rule = line.split("#", 1)[0].strip().lower()
+        if not rule:
+            continue
+        kind, sep, value = rule.partition(":")
+        if not sep:
+            kind, value = ("email" if "@" in rule[1:] else "domain"), rule
+        value = value.strip()
+        if kind == "domain":
+            domains.append(value)
+        elif kind == "email":
+            emails.append(value)
+        elif kind == "contains":
+            substrings.append(value)
+        else:
+            print(f"[scope] ignoring unknown rule: {line.strip()}", flush=True)
+    return domains, emails, substrings
+
+def load(path: str = None) -> Scope:
+    """Build a Scope from the environment plus the rules file at `path`."""
+    domains = _env_list("SCOPE_DOMAIN") + _env_list("TARGET_DOMAIN")
+    emails = []
+    substrings = _env_list("SCOPE_EMAIL")
+
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                d, e, s = parse_rules(f)
+        except FileNotFoundError:
+            d, e, s = [], [], []
+        domains += d
+        emails += e
+        substrings += s
+
+    return Scope(domains, emails, substrings)
+
+# =========================================================
+# HOT RELOAD
+# =========================================================
+#
+# current() returns the active Scope. At most every SCOPE_RELOAD_SECONDS
+# it stats SCOPE_FILE and, if the file changed, builds a new Scope and
+# swaps it in. Callers take one snapshot per chunk or request and call
+# snapshot.allowed() per credential, so checks never touch the disk.
+
+_lock = threading.Lock()
+_current = None
+_file_stamp = None
+_next_check = 0.0
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def current() -> Scope:
+    global _current, _file_stamp, _next_check
+
+    now = time.monotonic()
+    if _current is not None and (now < _next_check or not SCOPE_FILE):
+        return _current
+
+    with _lock:
+        if _current is not None and now < _next_check:
+            return _current
+        _next_check = now + SCOPE_RELOAD_SECONDS
+
+        stamp = _stamp(SCOPE_FILE) if SCOPE_FILE else None
+        if _current is None or stamp != _file_stamp:
+            try:
+                scope = load(SCOPE_FILE)
+            except Exception as e:
+                # keep the rules we have; try again at the next check
+                print(f"[scope] reload of {SCOPE_FILE} failed: {e}", flush=True)
+                if _current is None:
+                    _current = load(None)
+                return _current
+            _current, _file_stamp = scope, stamp
+            print(
+                f"[scope] loaded {len(scope.domains)} domain(s), "
+                f"{len(scope.emails)} address(es), "
+                f"{len(scope.substrings)} substring(s) [{scope.digest}]",
+                flush=True
+            )
+
+    return _current
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import threading
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+# Which service wrote an event (set per image)
+SERVICE_NAME = os.getenv("SERVICE_NAME", "")
+
+# Append events to this file instead of stdout
+TRACE_LOG = os.getenv("TRACE_LOG", "")
+
+# Events waiting for the writer thread; beyond this they are dropped
+TRACE_QUEUE_MAX = int(os.getenv("TRACE_QUEUE_MAX", "10000"))
+
+# HTTP header carrying the trace id between services (JSON bodies also
+# carry it as "trace_id", so it shows up in n8n)
+TRACE_HEADER = "X-Trace-Id"
+
+# =========================================================
+# TRACE IDS
+# =========================================================
+#
+# The scraper creates a trace id when a message arrives. Every hop
+# passes it on: the delivery client sends a payload's "trace_id" as
+# X-Trace-Id, and receivers take it from the body or the header. Files
+# read later by the batch scanner are matched to their trace through
+# the extractor's job table.
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def trace_from(request, data: dict | None = None) -> str | None:
+    """The trace id of a Flask request: JSON body first, then header."""
+    trace = (data or {}).get("trace_id") or request.headers.get(TRACE_HEADER)
+    return str(trace)[:64] if trace else None
+
+# =========================================================
+# STRUCTURED EVENTS
+# =========================================================
+#
+# event() builds a JSON record and hands it to a background writer
+# thread; the caller never waits on stdout or the disk. Records are one
+# JSON object per line:
+#
+#   {"ts": 1700000000.123, "service": "extractor", "event": "extracted",
+#    "trace": "3f2a...", "source": "dump.txt", "extract_s": 12.5, ...}
+#
+# Durations are in seconds with an "_s" suffix. scripts/trace_report.py
+# rebuilds per-file latency breakdowns from these lines.
+
+class EventLog:
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=TRACE_QUEUE_MAX)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def emit(self, record: dict) -> None:
+        # a forked child has the parent's queue but not its writer thread
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    self._queue = queue.Queue(maxsize=TRACE_QUEUE_MAX)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._write_loop, daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        out = open(TRACE_LOG, "a", buffering=1) if TRACE_LOG else sys.stdout
+        while True:
+            record = self._queue.get()
+            try:
+                out.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+                if self._queue.empty():
+                    out.flush()
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued event is written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+_events = EventLog()
+atexit.register(_events.flush)
+
+def event(name: str, trace: str | None = None, **fields) -> None:
+    """Log a structured event without blocking."""
+    record = {
+        "ts": round(time.time(), 6),
+        "service": SERVICE_NAME,
+        "event": name,
+        "trace": trace,
+    }
+    for key, value in fields.items():
+        if key.endswith("_s") and isinstance(value, float):
+            value = round(value, 6)
+        record[key] = value
+    _events.emit(record)
+
+def flush() -> None:
+    _events.flush()
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+# =========================================================
+# ALERT STATE STORE
+# =========================================================
+#
+# Remembers which (email, password) pairs have already been alerted.
+# Keys are 16-byte sha256 digests of the pair, so no plaintext password
+# is kept on disk, and they live in an indexed SQLite table: membership
+# is an index lookup and each run only appends the keys it adds instead
+# of rewriting the whole history.
+
+def cred_key(email: str, password: str) -> bytes:
+    return hashlib.sha256(f"{email}\0{password}".encode()).digest()[:16]
+
+def open_state(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS alerted (key BLOB PRIMARY KEY) WITHOUT ROWID"
+    )
+    return conn
+
+def mark_alerted(conn: sqlite3.Connection, email: str, password: str) -> bool:
+    """Record a pair; returns False if it was already known."""
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO alerted VALUES (?)", (cred_key(email, password),)
+    )
+    return cur.rowcount == 1
+
+def migrate_json(conn: sqlite3.Connection, json_path: str) -> int:
+    """
+    One-shot import of the legacy .alerted_creds.json list of
+    [email, password] pairs. The JSON file is removed once its keys
+    are committed, so the plaintext passwords don't stay on disk.
+    """
+    if not os.path.exists(json_path):
+        return 0
+
+    try:
+        with open(json_path, "r") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[state] could not read {json_path}: {e}", flush=True)
+        return 0
+
+    if not isinstance(data, list):
+        data = []
+    pairs = [
+        x for x in data
+        if isinstance(x, (list, tuple)) and len(x) == 2
+        and isinstance(x[0], str) and isinstance(x[1], str)
+    ]
+
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO alerted VALUES (?)",
+            ((cred_key(email, password),) for email, password in pairs)
+        )
+        migrated = conn.total_changes - before
+
+    os.remove(json_path)
+    skipped = len(data) - len(pairs)
+    print(
+        f"[state] migrated {migrated} keys from {json_path}"
+        + (f" ({skipped} invalid entries skipped)" if skipped else ""),
+        flush=True
+    )
+    return migrated
@@ -1,8 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
-import requests
+import time
+import threading
 
-from extractor import extract_emails
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+import jobs
+import tracing
+from delivery import client, Batch, COALESCE_MAX_CREDS
+from extractor import extract_batches, extract_stream
 
 app = Flask(__name__)
 
@@ -12,6 +18,12 @@ app = Flask(__name__)
 
 N8N_WEBHOOK = os.getenv("N8N_WEBHOOK")
 
+# Streamed uploads scanned at once; more get 429 (the scraper then
+# queues the finished file's path instead)
+STREAM_MAX = int(os.getenv("EXTRACT_STREAM_MAX", "2"))
+
+_stream_slots = threading.BoundedSemaphore(max(1, STREAM_MAX))
+
 # =========================================================
 # HEALTH CHECK
 # =========================================================
@@ -24,67 +36,221 @@ def health():
 # EXTRACTION ENDPOINT
 # =========================================================
 
-@app.route("/extract", methods=["POST"])
-def extract():
-    data = request.get_json(silent=True) or {}
-    path = data.get("filepath")
-
-    # ---- Basic path safety ----
-    if not path or not isinstance(path, str) or not path.startswith("/files"):
-        return jsonify({"error": "Invalid file path"}), 400
-
-    # ---- Run extractor ----
-    result = extract_emails(path)
-
-    emails = result.get("emails", [])
-    creds = result.get("creds", [])
-
-    if not emails and not creds:
-        return jsonify({
-            "status": "no scoped data",
-            "source": os.path.basename(path)
-        }), 200
-
+def forward(source: str, emails: list, creds: list, trace=None) -> None:
     payload = {
-        "source": os.path.basename(path),
+        "source": source,
         "emails": emails,
         "email_count": len(emails),
         "creds": creds,
         "cred_count": len(creds),
     }
-
-    # ---- Forward to n8n if configured ----
-    if not N8N_WEBHOOK:
-        print(
-            "[extractor] N8N_WEBHOOK not set, skipping forward",
-            flush=True
-        )
-        return jsonify(payload), 200
+    if trace:
+        payload["trace_id"] = trace
 
     try:
-        r = requests.post(
-            N8N_WEBHOOK,
-            json=payload,
-            timeout=15
-        )
+        r = client.send(N8N_WEBHOOK, payload, timeout=15)
         print(
             f"[extractor] forwarded "
             f"{len(creds)} creds / {len(emails)} emails "
-            f"from {path} (status {r.status_code})",
+            f"from {source} "
+            f"({f'status {r.status_code}' if r is not None else 'coalescing'})",
             flush=True
         )
     except Exception as e:
         print(
-            f"[extractor] forward failed for {path}: {e}",
+            f"[extractor] forward failed for {source}: {e}",
             flush=True
         )
 
-    return jsonify(payload), 200
+def run_extraction(path: str, progress=None, trace=None) -> dict:
+    """
+    Job handler: extract and forward the file's credentials to n8n as
+    one payload (n8n alerts once per file); returns the counts. Only
+    the deduplicated in-scope result is held, never the raw records.
+    """
+    started = time.perf_counter()
+    source = os.path.basename(path)
+    if not N8N_WEBHOOK:
+        print("[extractor] N8N_WEBHOOK not set, skipping forward", flush=True)
+
+    emails = []
+    creds = []
+    cred_count = 0
+    for batch in extract_batches(path, progress):
+        # batches come sorted by email, so emails dedup by neighbour
+        for c in batch:
+            if not emails or emails[-1] != c["email"]:
+                emails.append(c["email"])
+        cred_count += len(batch)
+        if N8N_WEBHOOK:
+            creds.extend(batch)
+    email_count = len(emails)
+
+    if N8N_WEBHOOK and cred_count:
+        forward(source, emails, creds, trace)
+
+    tracing.event(
+        "extracted", trace, path=path, emails=email_count, creds=cred_count,
+        extract_s=time.perf_counter() - started
+    )
+
+    if not cred_count:
+        return {
+            "status": "no scoped data",
+            "source": source
+        }
+
+    return {
+        "source": source,
+        "email_count": email_count,
+        "cred_count": cred_count,
+    }
+
+@app.route("/extract", methods=["POST"])
+def extract():
+    data = request.get_json(silent=True) or {}
+    path = data.get("filepath")
+    trace = tracing.trace_from(request, data)
+
+    # ---- Basic path safety ----
+    if not path or not isinstance(path, str) or not path.startswith("/files"):
+        return jsonify({"error": "Invalid file path"}), 400
+
+    # ---- Queue the extraction ----
+    job_id = jobs.submit(path, trace)
+    if job_id is None:
+        return jsonify({
+            "error": "extraction queue full",
+            "queue_depth": jobs.depth()
+        }), 429
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "source": os.path.basename(path)
+    }), 202
+
+# =========================================================
+# STREAMING EXTRACTION (scan while the scraper downloads)
+# =========================================================
+
+@app.route("/extract/stream", methods=["POST"])
+def extract_streamed():
+    """
+    The request body is the file itself, sent (chunked) while it is
+    downloading. In-scope credentials are forwarded to n8n as they are
+    found, every COALESCE_MAX_CREDS and at the end; the response
+    summarises the whole file. 415 means the file's kind can't be
+    scanned as a stream, 429 that EXTRACT_STREAM_MAX uploads are already
+    being scanned: queue its path instead.
+    """
+    source = os.path.basename(request.args.get("source") or "stream")
+    if not _stream_slots.acquire(blocking=False):
+        return jsonify({"error": "too many streams", "source": source}), 429
+    try:
+        return stream_extraction(source)
+    finally:
+        _stream_slots.release()
+
+def stream_extraction(source: str):
+    trace = tracing.trace_from(request)
+    started = time.perf_counter()
+
+    # hits are merged into one batch, sent every COALESCE_MAX_CREDS
+    # creds and once at the end, not one POST per chunk
+    pending = None
+
+    def flush():
+        nonlocal pending
+        if pending is not None:
+            forward(source, sorted(pending.emails), list(pending.creds.values()), trace)
+            pending = None
+
+    def found(pairs):
+        nonlocal pending
+        if not N8N_WEBHOOK:
+            return
+
+        creds = [{"email": e, "password": p} for e, p in pairs]
+        payload = {"source": source, "emails": [c["email"] for c in creds], "creds": creds}
+        if pending is None:
+            pending = Batch(payload, 15)
+        else:
+            pending.add(payload)
+        if len(pending.creds) >= COALESCE_MAX_CREDS:
+            flush()
+
+    try:
+        result = extract_stream(request.stream, source, found)
+    finally:
+        flush()
+    if result is None:
+        return jsonify({"error": "not streamable", "source": source}), 415
+
+    # includes the download: the body arrives as the scraper fetches it
+    tracing.event(
+        "extracted", trace, path=source, emails=result["email_count"],
+        creds=result["cred_count"], streamed=True,
+        extract_s=time.perf_counter() - started,
+        **({"error": result["error"]} if "error" in result else {})
+    )
+
+    body = {
+        "status": "done",
+        "source": source,
+        "email_count": result["email_count"],
+        "cred_count": result["cred_count"],
+    }
+    if result.get("error"):
+        # corrupt or truncated: what was scanned before it was forwarded
+        body["status"] = "partial"
+        body["error"] = result["error"]
+    return jsonify(body), 200
+
+# =========================================================
+# JOB STATUS
+# =========================================================
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    body = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "source": os.path.basename(job["path"]),
+        "progress": job["progress"] or {},
+    }
+    if job["status"] == "done":
+        body["result"] = job["result"]
+    elif job["status"] == "failed":
+        body["error"] = job["error"]
+
+    return jsonify(body), 200
+
+# =========================================================
+# DELIVERY COUNTERS
+# =========================================================
+
+@app.route("/delivery/stats", methods=["GET"])
+def delivery_stats():
+    return jsonify(client.stats()), 200
+
+# =========================================================
+# METRICS
+# =========================================================
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
 
 # =========================================================
 # MAIN
 # =========================================================
 
 if __name__ == "__main__":
+    jobs.start(run_extraction)
     print("Extractor running on 0.0.0.0:8001", flush=True)
     app.run(host="0.0.0.0", port=8001)
@@ -0,0 +1,226 @@
+import os
+import time
+import hashlib
+import sqlite3
+import tempfile
+
+from dedup import write_pairs, read_pairs, READ_BUFFER
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+# Empty EXTRACT_CACHE_PATH disables the cache
+CACHE_PATH      = os.getenv("EXTRACT_CACHE_PATH", "/files/.extract_cache.sqlite")
+CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(256_000_000)))
+
+# Credential files of the cached results live next to the index
+CACHE_DIR = CACHE_PATH + ".d"
+
+# =========================================================
+# CONTENT-HASH RESULT CACHE
+# =========================================================
+#
+# Maps the sha256 of a file's content to its extraction result: the
+# counts, in the SQLite index, and the unique sorted (email, password)
+# pairs, in a pairs file under CACHE_DIR that is streamed back on a hit
+# (an empty result is the "no scoped data" verdict and has no file).
+# Reposted or renamed copies of a dump then cost one hash pass instead of
+# a full scan, and no result is ever held in memory whole.
+#
+# The index is tied to a scope string (the scope rules and anything else
+# that changes results); opening it with a different scope drops every
+# entry. Least recently used entries are evicted once the pairs files
+# exceed CACHE_MAX_BYTES.
+
+def enabled() -> bool:
+    return bool(CACHE_PATH)
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def _pairs_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, digest + ".pairs")
+
+def _remove(digest: str) -> None:
+    try:
+        os.remove(_pairs_path(digest))
+    except FileNotFoundError:
+        pass
+
+def _clear_files() -> None:
+    # results being written right now keep their temp files
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith(".pairs"):
+            _remove(name[:-len(".pairs")])
+
+def _connect(scope: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(CACHE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    # indexes written before results moved out of SQLite held every
+    # credential inline; zero their pages rather than just freeing them
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'results'").fetchone():
+        conn.execute("PRAGMA secure_delete = ON")
+        with conn:
+            conn.execute("DROP TABLE results")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print("[cache] dropped inline results of an older cache format", flush=True)
+
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " digest TEXT PRIMARY KEY,"
+        " creds INTEGER NOT NULL,"
+        " emails INTEGER NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " last_used REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    row = conn.execute("SELECT value FROM meta WHERE key = 'scope'").fetchone()
+    if row is None or row[0] != scope:
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('scope', ?)", (scope,))
+        _clear_files()
+        if row is not None:
+            print("[cache] scope changed, index cleared", flush=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return conn
+
+def lookup(digest: str, scope: str):
+    """
+    A cached result as (counts, pairs) or None. `counts` holds "creds"
+    and "emails"; `pairs` iterates the (email, password) pairs from disk
+    and must be consumed (or closed) by the caller.
+    """
+    try:
+        conn = _connect(scope)
+        try:
+            row = conn.execute(
+                "SELECT creds, emails FROM entries WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            f = None
+            if row[0]:
+                try:
+                    f = open(_pairs_path(digest), "rb", buffering=READ_BUFFER)
+                except FileNotFoundError:
+                    # the pairs file is gone: forget the entry
+                    with conn:
+                        conn.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+                    return None
+
+            with conn:
+                conn.execute(
+                    "UPDATE entries SET last_used = ? WHERE digest = ?",
+                    (time.time(), digest)
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[cache] lookup failed: {e}", flush=True)
+        return None
+
+    return {"creds": row[0], "emails": row[1]}, _stream(f)
+
+def _stream(f):
+    if f is None:
+        return
+    with f:
+        yield from read_pairs(f)
+
+class Writer:
+    """
+    Tee for a result being streamed to its consumer: write() each
+    sorted unique pair as it goes by, then commit(digest) to add the
+    entry (a streamed file's digest is only known at its end).
+    Leaving the block without commit() (an error, a consumer that
+    stopped early) discards what was written.
+    """
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.creds = 0
+        self.emails = 0
+        self._last_email = None
+        self._f = None
+        self._tmp = None
+
+    def __enter__(self):
+        if not enabled():
+            return self
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(suffix=".tmp", dir=CACHE_DIR)
+            self._f = os.fdopen(fd, "wb", buffering=READ_BUFFER)
+        except Exception as e:
+            print(f"[cache] store failed: {e}", flush=True)
+        return self
+
+    def write(self, email: str, password: str) -> None:
+        self.creds += 1
+        if email != self._last_email:
+            self.emails += 1
+            self._last_email = email
+        if self._f is not None:
+            write_pairs(self._f, ((email, password),))
+
+    def commit(self, digest: str) -> None:
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        size = os.path.getsize(self._tmp)
+        if size > CACHE_MAX_BYTES:
+            return
+
+        try:
+            conn = _connect(self.scope)
+            try:
+                if self.creds:
+                    os.replace(self._tmp, _pairs_path(digest))
+                    self._tmp = None
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (digest, self.creds, self.emails, size, time.time())
+                    )
+                    _evict(conn)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"[cache] store failed: {e}", flush=True)
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            self._f.close()
+        if self._tmp is not None:
+            try:
+                os.remove(self._tmp)
+            except FileNotFoundError:
+                pass
+
+def _evict(conn: sqlite3.Connection) -> None:
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    doomed = []
+    for digest, size in conn.execute("SELECT digest, size FROM entries ORDER BY last_used"):
+        if total <= CACHE_MAX_BYTES:
+            break
+        doomed.append((digest,))
+        total -= size
+
+    conn.executemany("DELETE FROM entries WHERE digest = ?", doomed)
+    for (digest,) in doomed:
+        _remove(digest)
@@ -0,0 +1,184 @@
+import os
+import heapq
+import shutil
+import tempfile
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+# Approximate RAM the in-memory set may use before spilling to disk
+DEDUP_MEMORY_MB = float(os.getenv("DEDUP_MEMORY_MB", "512"))
+
+# Where spill runs go (default: the system temp dir)
+DEDUP_SPILL_DIR = os.getenv("DEDUP_SPILL_DIR") or None
+
+# Runs merged at once; more are first merged down in passes
+DEDUP_MAX_RUNS = int(os.getenv("DEDUP_MAX_RUNS", "64"))
+
+# Estimated per-key cost of a bytes object in a set, besides its payload
+ENTRY_OVERHEAD = 100
+
+READ_BUFFER = 1 << 20
+
+# =========================================================
+# SPILLING CREDENTIAL SET
+# =========================================================
+#
+# Each (email, password) pair is stored as one bytes key,
+# b"email\0password". Emails never contain NUL and credentials never
+# contain a newline, so keys can be written one per line.
+#
+# Once the estimated size of the in-memory set passes the ceiling, its
+# keys are written out sorted as a run file and the set is cleared.
+# Iterating k-way merges the runs with what is still in memory and
+# drops adjacent duplicates, so the pairs come out unique and sorted by
+# email. Peak memory is the ceiling plus one read buffer per run.
+
+def _key(email: str, password: str) -> bytes:
+    return f"{email}\0{password}".encode()
+
+def _pair(key: bytes) -> tuple:
+    email, _, password = key.decode().partition("\0")
+    return email, password
+
+def _read_run(path: str):
+    with open(path, "rb", buffering=READ_BUFFER) as f:
+        for line in f:
+            yield line[:-1]
+
+def write_pairs(f, pairs) -> int:
+    """Write (email, password) pairs to binary file `f` as run lines."""
+    count = 0
+    for email, password in pairs:
+        f.write(_key(email, password) + b"\n")
+        count += 1
+    return count
+
+def read_pairs(f):
+    """Yield the (email, password) pairs of a file written by write_pairs()."""
+    for line in f:
+        yield _pair(line[:-1])
+
+def _unique(keys):
+    prev = None
+    for key in keys:
+        if key != prev:
+            yield key
+            prev = key
+
+class CredSet:
+    def __init__(self, memory_mb: float | None = None, spill_dir: str | None = None):
+        mb = DEDUP_MEMORY_MB if memory_mb is None else memory_mb
+        self.limit = int(mb * 1024 * 1024)
+        self.spill_dir = spill_dir or DEDUP_SPILL_DIR
+
+        self.added = 0     # pairs offered, duplicates included
+        self.unique = None # known after the first full iteration
+
+        self._keys = set()
+        self._size = 0
+        self._runs = []
+        self._tmp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------------------
+    # adding
+    # ---------------------------------------------------------
+
+    def add(self, email: str, password: str) -> None:
+        self.update(((email, password),))
+
+    def update(self, pairs) -> None:
+        keys = self._keys
+        size = self._size
+        added = 0
+
+        for email, password in pairs:
+            key = _key(email, password)
+            added += 1
+            if key in keys:
+                continue
+            keys.add(key)
+            size += len(key) + ENTRY_OVERHEAD
+            if size >= self.limit:
+                self._size = size
+                self.spill()
+                size = 0
+
+        self._size = size
+        self.added += added
+
+    def spill(self) -> None:
+        """Write the in-memory keys out as a sorted run."""
+        if not self._keys:
+            return
+        path = self._new_run()
+        with open(path, "wb") as f:
+            f.writelines(k + b"\n" for k in sorted(self._keys))
+        self._runs.append(path)
+        self._keys.clear()
+        self._size = 0
+
+    def add_runs(self, paths: list, added: int = 0) -> None:
+        """Adopt the runs of another CredSet (e.g. a shard worker's)."""
+        self._runs.extend(paths)
+        self.added += added
+
+    def runs(self) -> list:
+        """Spill whatever is in memory and hand over the run files."""
+        self.spill()
+        runs, self._runs = self._runs, []
+        return runs
+
+    def workdir(self) -> str:
+        """Spill directory; removed with everything in it by close()."""
+        if self._tmp is None:
+            self._tmp = tempfile.mkdtemp(prefix="dedup-", dir=self.spill_dir)
+        return self._tmp
+
+    def _new_run(self) -> str:
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.workdir())
+        os.close(fd)
+        return path
+
+    # ---------------------------------------------------------
+    # reading
+    # ---------------------------------------------------------
+
+    def _compact(self) -> None:
+        # merge the oldest runs down until one merge pass can open them all
+        while len(self._runs) > DEDUP_MAX_RUNS:
+            group = self._runs[:DEDUP_MAX_RUNS]
+            path = self._new_run()
+            with open(path, "wb") as f:
+                f.writelines(
+                    k + b"\n" for k in _unique(heapq.merge(*(_read_run(p) for p in group)))
+                )
+            for p in group:
+                os.remove(p)
+            self._runs = self._runs[DEDUP_MAX_RUNS:] + [path]
+
+    def __iter__(self):
+        """Yield unique (email, password) pairs, sorted."""
+        self._compact()
+        sources = [_read_run(p) for p in self._runs]
+        sources.append(iter(sorted(self._keys)))
+
+        unique = 0
+        for key in _unique(heapq.merge(*sources)):
+            unique += 1
+            yield _pair(key)
+        self.unique = unique
+
+    def close(self) -> None:
+        self._keys = set()
+        self._runs = []
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
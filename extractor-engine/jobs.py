@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+
+from prometheus_client import Counter, Gauge
+
+import tracing
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+JOBS_DB       = os.getenv("JOBS_DB", "/files/.extract_jobs.sqlite")
+JOB_WORKERS   = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+
+# Finished jobs are kept this long for /jobs/<id> lookups
+JOB_RETENTION = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+# Result fields that hold credentials; they are never written to the
+# job table, only the counts and status around them
+SECRET_FIELDS = ("emails", "creds")
+
+# =========================================================
+# PERSISTENT JOB QUEUE
+# =========================================================
+#
+# Jobs are rows in SQLite (queued -> running -> done | failed); the
+# in-memory queue only carries job ids to a fixed pool of worker
+# threads. At start-up, jobs left queued or running by a previous
+# process are put back on the queue, so pending work survives a
+# container restart. Admission is bounded by JOB_QUEUE_MAX. A finished
+# job keeps a summary of its result (status, source, counts), never the
+# credentials themselves.
+#
+# A job keeps the trace id it was submitted with; trace_of() lets the
+# batch scanner tie a file it picks up later to the same trace.
+
+_queue = queue.Queue()
+_lock = threading.Lock()
+_handler = None
+
+JOBS_FINISHED = Counter(
+    "extractor_jobs_total",
+    "Extraction jobs finished, by outcome", ["status"]
+)
+JOBS_REJECTED = Counter(
+    "extractor_jobs_rejected_total",
+    "Submissions refused because the queue was full"
+)
+JOBS_RUNNING = Gauge(
+    "extractor_jobs_running",
+    "Jobs currently being extracted"
+)
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _init_db() -> None:
+    conn = _connect()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " progress TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " created REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " trace TEXT)"
+        )
+        # job tables created before traces existed
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "trace" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN trace TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_path ON jobs(path, created)")
+        conn.commit()
+        _scrub(conn)
+    finally:
+        conn.close()
+
+def _summary(result) -> dict:
+    if not isinstance(result, dict):
+        return {}
+    return {k: v for k, v in result.items() if k not in SECRET_FIELDS}
+
+def _scrub(conn: sqlite3.Connection) -> None:
+    """Strip credentials from results stored before summaries were."""
+    rows = conn.execute(
+        "SELECT id, result FROM jobs WHERE result LIKE '%\"creds\"%'"
+        " OR result LIKE '%\"emails\"%'"
+    ).fetchall()
+    if not rows:
+        return
+
+    # overwrite freed pages too, and fold the WAL back into the file
+    conn.execute("PRAGMA secure_delete = ON")
+    with conn:
+        conn.executemany(
+            "UPDATE jobs SET result = ? WHERE id = ?",
+            [(json.dumps(_summary(json.loads(row["result"]))), row["id"]) for row in rows]
+        )
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print(f"[jobs] removed credentials from {len(rows)} stored result(s)", flush=True)
+
+def _update(job_id: str, **fields) -> None:
+    fields["updated"] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+    finally:
+        conn.close()
+
+def _worker() -> None:
+    while True:
+        job_id = _queue.get()
+        try:
+            _run(job_id)
+        except Exception as e:
+            print(f"[jobs] {job_id} crashed: {e}", flush=True)
+        finally:
+            _queue.task_done()
+
+def _claim(job_id: str) -> bool:
+    """Atomically move a job from queued to running."""
+    conn = _connect()
+    try:
+        with conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'running', updated = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+def _run(job_id: str) -> None:
+    if not _claim(job_id):
+        return
+    job = get(job_id)
+    tracing.event(
+        "extract_started", job["trace"], job_id=job_id, path=job["path"],
+        queue_wait_s=time.time() - job["created"]
+    )
+
+    def progress(counters: dict) -> None:
+        _update(job_id, progress=json.dumps(counters))
+
+    try:
+        with JOBS_RUNNING.track_inprogress():
+            result = _handler(job["path"], progress, job["trace"])
+    except Exception as e:
+        print(f"[jobs] {job_id} failed: {e}", flush=True)
+        _update(job_id, status="failed", error=str(e))
+        JOBS_FINISHED.labels("failed").inc()
+        return
+
+    _update(job_id, status="done", result=json.dumps(_summary(result)))
+    JOBS_FINISHED.labels("done").inc()
+
+def start(handler) -> None:
+    """
+    Start the worker pool. `handler(path, progress, trace)` does the work
+    and returns a JSON-serialisable result; only its summary is kept.
+    """
+    global _handler
+    _handler = handler
+
+    _init_db()
+
+    # jobs interrupted mid-run by a restart start over
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    for row in rows:
+        _queue.put(row["id"])
+    if rows:
+        print(f"[jobs] resumed {len(rows)} pending job(s)", flush=True)
+
+    for _ in range(JOB_WORKERS):
+        threading.Thread(target=_worker, daemon=True).start()
+
+def submit(path: str, trace: str | None = None) -> str | None:
+    """Queue a job; returns its id, or None if the queue is full."""
+    with _lock:
+        if _queue.qsize() >= JOB_QUEUE_MAX:
+            JOBS_REJECTED.inc()
+            return None
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, path, status, created, updated, trace)"
+                    " VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (job_id, path, now, now, trace)
+                )
+                conn.execute(
+                    "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                    (now - JOB_RETENTION,)
+                )
+        finally:
+            conn.close()
+
+        _queue.put(job_id)
+        return job_id
+
+def get(job_id: str) -> dict | None:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return None
+
+    job = dict(row)
+    for key in ("progress", "result"):
+        if job[key] is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+def trace_of(path: str) -> str | None:
+    """Trace id of the latest job for `path`, if it had one."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT trace FROM jobs WHERE path = ? AND trace IS NOT NULL"
+            " ORDER BY created DESC LIMIT 1",
+            (path,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # no job table (yet), or one without traces
+        return None
+    finally:
+        conn.close()
+    return row["trace"] if row else None
+
+def depth() -> int:
+    """Jobs waiting for a worker."""
+    return _queue.qsize()
+
+Gauge("extractor_job_queue_depth", "Jobs waiting for a worker").set_function(depth)
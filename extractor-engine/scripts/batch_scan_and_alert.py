@@ -2,15 +2,23 @@
 import sys
 import os
 import glob
-import json
 import time
-import requests
-from typing import Set, Tuple, List
+import fcntl
+import tempfile
+import itertools
+import threading
+import concurrent.futures
+from typing import List
 
 # Make sure /app is importable (cron-safe)
 sys.path.insert(0, "/app")
 
-from extractor import extract_emails
+import jobs
+import tracing
+from extractor import scan_pairs
+from dedup import write_pairs, read_pairs, DEDUP_SPILL_DIR, READ_BUFFER
+from alert_state import open_state, mark_alerted, migrate_json
+from delivery import client
 
 # =========================================================
 # CONFIG
@@ -18,7 +26,9 @@ from extractor import extract_emails
 
 FILES_DIR     = "/files"
 PROCESSED_DIR = "/files/_processed"
-STATE_FILE    = "/files/.alerted_creds.json"
+STATE_DB      = "/files/.alerted_creds.sqlite"
+LEGACY_STATE  = "/files/.alerted_creds.json"
+LOCK_FILE     = "/files/.batch_scan.lock"
 
 FILTER_URL    = os.getenv("FILTER_URL", "http://filter-engine:7000/ingest")
 
@@ -27,152 +37,253 @@ POST_TIMEOUT  = int(os.getenv("POST_TIMEOUT", "15"))
 POST_RETRIES  = int(os.getenv("POST_RETRIES", "3"))
 RETRY_SLEEP   = int(os.getenv("RETRY_SLEEP", "5"))
 
+# Files extracted in parallel (processes) / batches in flight (threads)
+SCAN_WORKERS  = int(os.getenv("SCAN_WORKERS", "2"))
+SEND_WORKERS  = int(os.getenv("SEND_WORKERS", "4"))
+
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
 # =========================================================
-# STATE HANDLING
+# HELPERS
 # =========================================================
 
-def load_state() -> Set[Tuple[str, str]]:
-    if not os.path.exists(STATE_FILE):
-        return set()
+def chunked(items, size: int):
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+def acquire_lock():
+    """
+    Hold an exclusive lock for the whole run so overlapping cron
+    invocations never pick up the same file. Returns None if another
+    run still holds it.
+    """
+    fh = open(LOCK_FILE, "w")
     try:
-        with open(STATE_FILE, "r") as f:
-            data = json.load(f)
-            return set(tuple(x) for x in data)
-    except Exception:
-        return set()
-
-def save_state(alerted: Set[Tuple[str, str]]) -> None:
-    tmp = STATE_FILE + ".tmp"
-    with open(tmp, "w") as f:
-        json.dump(list(alerted), f)
-    os.replace(tmp, STATE_FILE)
-
-def chunked(items: List[dict], size: int):
-    for i in range(0, len(items), size):
-        yield items[i:i + size]
-
-# =========================================================
-# MAIN
-# =========================================================
-
-alerted = load_state()
-
-files = sorted(
-    f for f in glob.glob(f"{FILES_DIR}/*.txt")
-    if not f.startswith(PROCESSED_DIR + "/")
-)
-
-for path in files:
-    base = os.path.basename(path)
-
-    # Skip underscore-prefixed files
-    if base.startswith("_"):
-        continue
-
-    print(f"\n[+] Scanning {path}", flush=True)
-
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+def scan_file(path: str) -> tuple:
+    """
+    Extraction stage (runs in the process pool). The unique pairs are
+    written to a temp file rather than sent back whole:
+    (pairs file, pair count, seconds).
+    """
+    started = time.perf_counter()
+    fd, out = tempfile.mkstemp(prefix="batch-scan-", suffix=".pairs", dir=DEDUP_SPILL_DIR)
     try:
-        result = extract_emails(path)
-    except Exception as e:
-        print(f"    [!] extract_emails failed: {e}", flush=True)
-        continue
-
-    creds = result.get("creds") or []
-    if not creds:
-        print("    [-] No in-scope credentials", flush=True)
-        continue
-
-    # -----------------------------------------------------
-    # Deduplicate against alert history
-    # -----------------------------------------------------
-
+        with os.fdopen(fd, "wb", buffering=READ_BUFFER) as f:
+            count = write_pairs(f, scan_pairs(path))
+    except BaseException:
+        os.remove(out)
+        raise
+    return out, count, time.perf_counter() - started
+
+def send_batch(base: str, batch: List[dict], trace: str | None = None) -> bool:
+    """Delivery stage (runs in the thread pool), with retries."""
+    emails = sorted({c["email"] for c in batch if c.get("email")})
+
+    payload = {
+        "source": base,
+        "emails": emails,
+        "email_count": len(emails),
+        "creds": batch,
+        "cred_count": len(batch),
+    }
+    if trace:
+        payload["trace_id"] = trace
+
+    started = time.perf_counter()
+    for attempt in range(1, POST_RETRIES + 1):
+        try:
+            r = client.post(FILTER_URL, payload, timeout=POST_TIMEOUT)
+            if r.status_code == 200:
+                tracing.event(
+                    "batch_sent", trace, path=base, creds=len(batch),
+                    attempts=attempt, post_s=time.perf_counter() - started
+                )
+                print(f"    [+] {base}: batch sent ({len(batch)} creds)", flush=True)
+                return True
+            print(
+                f"    [!] {base}: HTTP {r.status_code} (attempt {attempt})",
+                flush=True
+            )
+        except Exception as e:
+            print(
+                f"    [!] {base}: POST failed (attempt {attempt}): {e}",
+                flush=True
+            )
+        if attempt < POST_RETRIES:
+            time.sleep(RETRY_SLEEP * attempt)
+
+    tracing.event(
+        "batch_failed", trace, path=base, creds=len(batch),
+        attempts=POST_RETRIES, post_s=time.perf_counter() - started
+    )
+    print(f"    [!] {base}: batch failed ({len(batch)} creds)", flush=True)
+    return False
+
+def fresh_creds(alerted, pairs) -> List[dict]:
+    """Deduplicate (email, password) pairs against alert history, recording the new ones."""
     fresh = []
-    for c in creds:
-        email = c.get("email")
-        password = c.get("password")
+    for email, password in pairs:
         if not email or not password:
             continue
 
-        key = (email, password)
-        if key in alerted:
+        if not mark_alerted(alerted, email, password):
             continue
 
-        alerted.add(key)
-        fresh.append(c)
+        fresh.append({"email": email, "password": password})
 
-    if not fresh:
-        print("    [-] All matches already alerted", flush=True)
-        continue
+    alerted.commit()
+    return fresh
 
-    print(f"    [+] New credentials: {len(fresh)}", flush=True)
+def finish_file(path: str, sends: list) -> None:
+    """Move a file to _processed once its batches are done, if any succeeded."""
+    base = os.path.basename(path)
 
     sent_any = False
+    for f in sends:
+        try:
+            sent_any = f.result() or sent_any
+        except Exception as e:
+            print(f"    [!] {base}: delivery error: {e}", flush=True)
 
-    # -----------------------------------------------------
-    # Send in batches
-    # -----------------------------------------------------
-
-    for batch in chunked(fresh, BATCH_SIZE):
-        emails = sorted({c["email"] for c in batch if c.get("email")})
-
-        payload = {
-            "source": base,
-            "emails": emails,
-            "email_count": len(emails),
-            "creds": batch,
-            "cred_count": len(batch),
-        }
+    if not sent_any:
+        print(f"    [!] {base}: nothing sent; file retained", flush=True)
+        return
 
-        ok = False
-        for attempt in range(1, POST_RETRIES + 1):
-            try:
-                r = requests.post(
-                    FILTER_URL,
-                    json=payload,
-                    timeout=POST_TIMEOUT
-                )
-                if r.status_code == 200:
-                    ok = True
-                    break
-                print(
-                    f"    [!] HTTP {r.status_code} (attempt {attempt})",
-                    flush=True
-                )
-            except Exception as e:
-                print(
-                    f"    [!] POST failed (attempt {attempt}): {e}",
-                    flush=True
-                )
-            time.sleep(RETRY_SLEEP)
-
-        if ok:
-            sent_any = True
-            print(f"    [+] Batch sent ({len(batch)} creds)", flush=True)
+    dst = os.path.join(PROCESSED_DIR, base)
+    try:
+        if os.path.exists(path):
+            os.replace(path, dst)
+            print(f"    [+] {base}: moved to _processed", flush=True)
         else:
-            print(f"    [!] Batch failed ({len(batch)} creds)", flush=True)
-
-    # -----------------------------------------------------
-    # Move file only if at least one batch succeeded
-    # -----------------------------------------------------
+            print(f"    [!] {base}: already moved by another process", flush=True)
+    except Exception as e:
+        print(f"    [!] {base}: move failed: {e}", flush=True)
 
-    if sent_any:
-        dst = os.path.join(PROCESSED_DIR, base)
-        try:
-            if os.path.exists(path):
-                os.replace(path, dst)
-                print("    [+] File moved to _processed", flush=True)
-            else:
-                print("    [!] File already moved by another process", flush=True)
-        except Exception as e:
-            print(f"    [!] Move failed: {e}", flush=True)
+def deliver_file(alerted, senders, in_flight, path: str, pairs_path: str,
+                 count: int, run_started: float, extract_s: float) -> list:
+    """Queue the fresh batches of one scanned file; returns their futures."""
+    base = os.path.basename(path)
+    trace = jobs.trace_of(path)
+    try:
+        cron_wait_s = run_started - os.path.getmtime(path)
+    except OSError:
+        cron_wait_s = None
+    tracing.event(
+        "batch_scanned", trace, path=path, creds=count,
+        cron_wait_s=cron_wait_s, extract_s=extract_s
+    )
+    if not count:
+        print(f"    [-] {base}: no in-scope credentials", flush=True)
+        return []
+
+    sends = []
+    fresh_total = 0
+    with open(pairs_path, "rb", buffering=READ_BUFFER) as f:
+        for pairs in chunked(read_pairs(f), BATCH_SIZE):
+            fresh = fresh_creds(alerted, pairs)
+            if not fresh:
+                continue
+            fresh_total += len(fresh)
+
+            in_flight.acquire()
+            future = senders.submit(send_batch, base, fresh, trace)
+            future.add_done_callback(lambda _: in_flight.release())
+            sends.append(future)
+
+    if not fresh_total:
+        print(f"    [-] {base}: all matches already alerted", flush=True)
     else:
-        print("    [!] Nothing sent; file retained", flush=True)
+        print(f"    [+] {base}: new credentials: {fresh_total}", flush=True)
+    return sends
 
 # =========================================================
-# FINALIZE
+# MAIN
 # =========================================================
+#
+# Pipeline: files are extracted in a process pool, each into a temp
+# file of unique pairs; as each one is ready it is read back BATCH_SIZE
+# pairs at a time, deduplicated against the alert history (main thread,
+# single SQLite writer) and its batches are handed to a thread pool that
+# POSTs them concurrently. At most SEND_WORKERS * 2 batches are waiting
+# at a time, so a file's credentials are never all in memory. A slow
+# filter-engine therefore only delays delivery, not the extraction of
+# other files.
+#
+# Files forwarded by the scraper are matched to their trace id through
+# the extractor's job table; cron_wait_s is the time from the file's
+# last write to the start of this run.
+
+def main() -> int:
+    lock = acquire_lock()
+    if lock is None:
+        print("[!] Another batch scan is still running; exiting", flush=True)
+        return 0
+
+    alerted = open_state(STATE_DB)
+    migrate_json(alerted, LEGACY_STATE)
+
+    files = sorted(
+        f for f in glob.glob(f"{FILES_DIR}/*.txt")
+        if not f.startswith(PROCESSED_DIR + "/")
+        # Skip underscore-prefixed files
+        and not os.path.basename(f).startswith("_")
+    )
+
+    pending = []
+    run_started = time.time()
+    in_flight = threading.BoundedSemaphore(SEND_WORKERS * 2)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=SCAN_WORKERS) as scanners, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=SEND_WORKERS) as senders:
+
+        scans = {}
+        for path in files:
+            print(f"[+] Scanning {path}", flush=True)
+            scans[scanners.submit(scan_file, path)] = path
+
+        for done in concurrent.futures.as_completed(scans):
+            path = scans[done]
+            base = os.path.basename(path)
 
-save_state(alerted)
-print("\n[✓] Batch scan complete", flush=True)
+            try:
+                pairs_path, count, extract_s = done.result()
+            except Exception as e:
+                print(f"    [!] {base}: extraction failed: {e}", flush=True)
+                continue
+
+            try:
+                sends = deliver_file(alerted, senders, in_flight, path, pairs_path, count, run_started, extract_s)
+            finally:
+                os.remove(pairs_path)
+            if sends:
+                pending.append((path, sends))
+
+        for path, sends in pending:
+            finish_file(path, sends)
+
+    # =====================================================
+    # FINALIZE
+    # =====================================================
+
+    for endpoint, st in client.stats().items():
+        print(
+            f"[delivery] {endpoint}: {st['requests']} request(s), "
+            f"{st['errors']} error(s), {st['bytes_sent']} bytes sent "
+            f"({st['bytes_json']} JSON), avg {st['latency_avg'] * 1000:.0f} ms",
+            flush=True
+        )
+
+    alerted.close()
+    lock.close()
+    print("\n[✓] Batch scan complete", flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic leak corpora for the extractor benchmarks.
+
+Everything is generated offline from a seed: combolists, URL:user:pass
+stealer logs, noisy application logs with a few credentials sprinkled
+in, multi-page PDFs and zip / 7z / rar (when a `rar` binary is on PATH)
+archives, including archives nested inside archives. A fraction
+`in_scope` of all credentials uses the target domain; the manifest
+records which (email, password) pairs the extractor should report.
+
+Usage:
+    python scripts/bench_corpus.py OUT_DIR [size_mb] [in_scope] [domain]
+"""
+import sys
+import os
+import io
+import gzip
+import json
+import random
+import shutil
+import zipfile
+import subprocess
+
+import py7zr
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+DEFAULT_DOMAIN   = "example.edu"
+OTHER_DOMAINS    = ["gmail.com", "yahoo.com", "mail.ru", "corp.co.uk", "outlook.com"]
+
+LOCAL_CHARS      = "abcdefghijklmnopqrstuvwxyz0123456789"
+LOCAL_TAIL_CHARS = LOCAL_CHARS + "._-"
+PW_CHARS         = "abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789!#$%&*"
+
+# =========================================================
+# RECORDS
+# =========================================================
+
+class CredentialSource:
+    """Draws credentials and remembers which ones are in scope."""
+
+    def __init__(self, rnd: random.Random, in_scope: float, domain: str):
+        self.rnd = rnd
+        self.in_scope = in_scope
+        self.domain = domain
+        self.expected = set()
+        self.records = 0
+
+    def email(self, scoped: bool | None = None) -> str:
+        rnd = self.rnd
+        local = rnd.choice(LOCAL_CHARS) + "".join(
+            rnd.choices(LOCAL_TAIL_CHARS, k=rnd.randint(3, 12))
+        )
+        if scoped is None:
+            scoped = rnd.random() < self.in_scope
+        return f"{local}@{self.domain if scoped else rnd.choice(OTHER_DOMAINS)}"
+
+    def cred(self) -> tuple:
+        email = self.email()
+        pw = "".join(self.rnd.choices(PW_CHARS, k=self.rnd.randint(6, 16)))
+        self.records += 1
+        if email.endswith("@" + self.domain):
+            self.expected.add((email, pw))
+        return email, pw
+
+def _fill(target_bytes: int, line) -> bytes:
+    out = []
+    size = 0
+    while size < target_bytes:
+        s = line()
+        out.append(s)
+        size += len(s) + 1
+    return ("\n".join(out) + "\n").encode()
+
+def combolist(src: CredentialSource, target_bytes: int) -> bytes:
+    seps = [":", ":", ":", ";", "|", ","]
+
+    def line():
+        email, pw = src.cred()
+        return f"{email}{src.rnd.choice(seps)}{pw}"
+
+    return _fill(target_bytes, line)
+
+def stealer_log(src: CredentialSource, target_bytes: int) -> bytes:
+    def line():
+        email, pw = src.cred()
+        host = f"{src.rnd.choice(['https', 'http'])}://login{src.rnd.randint(1, 500)}.example.com/auth"
+        return f"{host}:{email}:{pw}"
+
+    return _fill(target_bytes, line)
+
+def noisy_log(src: CredentialSource, target_bytes: int) -> bytes:
+    rnd = src.rnd
+    levels = ["INFO", "DEBUG", "WARN", "ERROR"]
+
+    def line():
+        r = rnd.random()
+        if r < 0.05:
+            email, pw = src.cred()
+            return f"2024-03-0{rnd.randint(1, 9)} user login {email}:{pw}"
+        if r < 0.20:
+            return f"2024-03-0{rnd.randint(1, 9)} INFO mail sent to {src.email(False)} status=250"
+        return (
+            f"2024-03-0{rnd.randint(1, 9)} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d} "
+            f"{rnd.choice(levels)} req={rnd.getrandbits(64):016x} "
+            f"ip=10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)} "
+            f"path=/api/v{rnd.randint(1, 3)}/items latency={rnd.randint(1, 900)}ms"
+        )
+
+    return _fill(target_bytes, line)
+
+# =========================================================
+# DOCUMENTS
+# =========================================================
+
+def pdf_document(pages: list) -> bytes:
+    """Minimal PDF with one text line per entry of each page."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+
+    for lines in pages:
+        ops = b" ".join(
+            b"(" + ln.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b") Tj T*"
+            for ln in lines
+        )
+        stream = b"BT /F1 8 Tf 20 820 Td 10 TL " + ops + b" ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Contents %d 0 R /Resources << /Font << /F1 %d 0 R >> >> >>"
+            % (pages_id, content, font)
+        ))
+
+    objects[pages_id - 1] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids)
+        + b"] /Count %d >>" % len(kids)
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(
+        b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, catalog, xref)
+    )
+    return out.getvalue()
+
+def pdf_leak(src: CredentialSource, pages: int, lines_per_page: int = 60) -> bytes:
+    body = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            email, pw = src.cred()
+            lines.append(f"{email}:{pw}".encode())
+        body.append(lines)
+    return pdf_document(body)
+
+# =========================================================
+# ARCHIVES
+# =========================================================
+
+def zip_bytes(members: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in members.items():
+            z.writestr(name, data)
+    return buf.getvalue()
+
+def sevenzip_bytes(members: dict) -> bytes:
+    buf = io.BytesIO()
+    with py7zr.SevenZipFile(buf, "w") as z:
+        for name, data in members.items():
+            z.writef(io.BytesIO(data), name)
+    return buf.getvalue()
+
+def write_rar(path: str, members: dict) -> bool:
+    """Needs the `rar` binary; returns False when it isn't installed."""
+    rar = shutil.which("rar")
+    if not rar:
+        return False
+    staging = path + ".d"
+    os.makedirs(staging, exist_ok=True)
+    try:
+        for name, data in members.items():
+            with open(os.path.join(staging, name), "wb") as f:
+                f.write(data)
+        subprocess.run(
+            [rar, "a", "-idq", "-ep1", path] + [os.path.join(staging, n) for n in members],
+            check=True
+        )
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return True
+
+# =========================================================
+# CORPUS
+# =========================================================
+
+def write_corpus(out_dir: str, size_mb: float = 16, in_scope: float = 0.01,
+                 domain: str = DEFAULT_DOMAIN, seed: int = 1337) -> list:
+    """
+    Write the benchmark files into `out_dir` and return the manifest:
+    one dict per file with its reader kind, raw (uncompressed) size,
+    credential record count and the expected in-scope pairs.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    target = int(size_mb * 1_000_000)
+    manifest = []
+
+    def entry(name: str, kind: str, data: bytes, raw_bytes: int, src: CredentialSource):
+        path = os.path.join(out_dir, name)
+        if data is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+        manifest.append({
+            "name": name,
+            "kind": kind,
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "raw_bytes": raw_bytes,
+            "records": src.records,
+            "expected": sorted(src.expected),
+        })
+
+    def source(salt: int) -> CredentialSource:
+        return CredentialSource(random.Random(seed * 1000 + salt), in_scope, domain)
+
+    src = source(1)
+    data = combolist(src, target)
+    entry("combolist.txt", "text", data, len(data), src)
+
+    src = source(2)
+    data = stealer_log(src, target)
+    entry("stealer.txt", "text", data, len(data), src)
+
+    src = source(3)
+    data = noisy_log(src, target)
+    entry("noise.log", "text", data, len(data), src)
+
+    src = source(4)
+    pages = max(1, target // 40 // 60 // 20)
+    entry("leak.pdf", "pdf", pdf_leak(src, pages), 0, src)
+
+    src = source(5)
+    members = {
+        "part1.txt": combolist(src, target // 2),
+        "part2.txt": stealer_log(src, target // 2),
+    }
+    raw = sum(len(v) for v in members.values())
+    entry("bundle.zip", "zip", zip_bytes(members), raw, src)
+
+    src = source(6)
+    members = {"dump.txt": combolist(src, target // 2), "log.txt": noisy_log(src, target // 2)}
+    raw = sum(len(v) for v in members.values())
+    entry("bundle.7z", "7z", sevenzip_bytes(members), raw, src)
+
+    src = source(7)
+    members = {"dump.txt": combolist(src, target // 2)}
+    raw = len(members["dump.txt"])
+    if write_rar(os.path.join(out_dir, "bundle.rar"), members):
+        entry("bundle.rar", "rar", None, raw, src)
+    else:
+        print("[corpus] rar binary not found; skipping bundle.rar", flush=True)
+
+    # zip > 7z > gz > text
+    src = source(8)
+    inner = combolist(src, target // 4)
+    nested = zip_bytes({
+        "level1.7z": sevenzip_bytes({"level2.txt.gz": gzip.compress(inner, 6)}),
+        "readme.txt": b"nested benchmark archive\n",
+    })
+    entry("nested.zip", "zip", nested, len(inner), src)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    return manifest
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    out = sys.argv[1]
+    size = float(sys.argv[2]) if len(sys.argv) > 2 else 16
+    ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    dom = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_DOMAIN
+
+    for item in write_corpus(out, size, ratio, dom):
+        print(
+            f"{item['name']:<14} {item['bytes'] / 1e6:8.2f} MB  "
+            f"{item['records']:>9} records  {len(item['expected']):>7} in scope",
+            flush=True
+        )
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compare the single-pass scanner in extractor.extract_all() against the
+legacy three-regex implementation.
+
+Usage:
+    python scripts/bench_scanner.py [file ...]
+
+Without arguments a synthetic combolist (plain, URL-prefixed, generic
+host:email:pw and noise lines) is generated in memory.
+"""
+import sys
+import os
+import random
+import time
+
+# Make sure the extractor (and, in a checkout, common/) is importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from extractor import (
+    CRED_RE,
+    URL_CRED_RE,
+    GENERIC_CRED_RE,
+    STREAM_CHUNK_SIZE,
+    extract_all,
+)
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+SYNTHETIC_LINES = int(os.getenv("BENCH_LINES", "500000"))
+ROUNDS          = int(os.getenv("BENCH_ROUNDS", "3"))
+
+# =========================================================
+# REFERENCE IMPLEMENTATION
+# =========================================================
+
+def legacy_extract_all(raw: bytes) -> list:
+    found = []
+    for rx in (CRED_RE, URL_CRED_RE, GENERIC_CRED_RE):
+        for m in rx.finditer(raw):
+            found.append((
+                m.group("user").decode(errors="ignore").lower(),
+                m.group("pw").decode(errors="ignore")
+            ))
+    return found
+
+# =========================================================
+# CORPUS
+# =========================================================
+
+def synthetic_corpus(lines: int) -> bytes:
+    rnd = random.Random(1337)
+    domains = ["gmail.com", "yahoo.com", "example.edu", "mail.ru", "corp.co.uk"]
+    local_chars = "abcdefghijklmnopqrstuvwxyz0123456789._"
+    pw_chars = "abcdefghijkXYZ0123456789!#$%"
+
+    out = []
+    for i in range(lines):
+        user = "".join(rnd.choice(local_chars) for _ in range(rnd.randint(4, 14)))
+        email = f"{user}@{rnd.choice(domains)}"
+        pw = "".join(rnd.choice(pw_chars) for _ in range(rnd.randint(6, 16)))
+        r = rnd.random()
+        if r < 0.6:
+            out.append(f"{email}:{pw}")
+        elif r < 0.8:
+            out.append(f"https://site{i % 97}.com/login:{email}:{pw}")
+        elif r < 0.9:
+            out.append(f"host{i % 13}.net:{email}:{pw}")
+        else:
+            out.append(f"2024-01-01 12:00:00 INFO id={i} path=/api/items status=200")
+    return ("\n".join(out) + "\n").encode()
+
+def chunks(data: bytes):
+    for i in range(0, len(data), STREAM_CHUNK_SIZE):
+        yield data[i:i + STREAM_CHUNK_SIZE]
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def bench(name: str, fn, data: bytes) -> list:
+    best = None
+    result = []
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        result = []
+        for chunk in chunks(data):
+            result.extend(fn(chunk))
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    mbps = len(data) / best / 1e6
+    print(f"  {name:<8} {best:8.3f}s  {mbps:8.2f} MB/s  {len(result)} tuples", flush=True)
+    return result
+
+def main(paths: list) -> int:
+    if paths:
+        corpora = []
+        for p in paths:
+            with open(p, "rb") as f:
+                corpora.append((p, f.read()))
+    else:
+        corpora = [("synthetic", synthetic_corpus(SYNTHETIC_LINES))]
+
+    ok = True
+    for name, data in corpora:
+        print(f"[bench] {name}: {len(data) / 1e6:.1f} MB", flush=True)
+        old = bench("legacy", legacy_extract_all, data)
+        new = bench("scanner", extract_all, data)
+        if old != new:
+            print("  [!] scanner output differs from legacy", flush=True)
+            ok = False
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
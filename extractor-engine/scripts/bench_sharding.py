@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measure how extract_emails() throughput scales with EXTRACT_WORKERS on a
+single large raw file.
+
+Usage:
+    python scripts/bench_sharding.py [file]
+
+Without a file a synthetic combolist of BENCH_MB megabytes is written to a
+temporary file first.
+"""
+import sys
+import os
+import tempfile
+import time
+
+# Make sure the extractor (and, in a checkout, common/) is importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# every worker count rescans the same file: a cache hit would time nothing
+os.environ["EXTRACT_CACHE_PATH"] = ""
+
+import extractor
+from bench_scanner import synthetic_corpus
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+BENCH_MB     = int(os.getenv("BENCH_MB", "256"))
+MAX_WORKERS  = int(os.getenv("BENCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def worker_counts(limit: int) -> list:
+    counts = []
+    n = 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    counts.append(limit)
+    return counts
+
+def write_corpus(path: str, megabytes: int) -> None:
+    block = synthetic_corpus(100_000)
+    with open(path, "wb") as f:
+        written = 0
+        while written < megabytes * 1_000_000:
+            f.write(block)
+            written += len(block)
+
+def main(argv: list) -> int:
+    tmp = None
+    if argv:
+        path = argv[0]
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix=".txt", delete=False)
+        tmp.close()
+        path = tmp.name
+        write_corpus(path, BENCH_MB)
+
+    try:
+        size = os.path.getsize(path)
+        print(f"[bench] {path}: {size / 1e6:.1f} MB, {os.cpu_count()} CPUs", flush=True)
+
+        extractor.SHARD_MIN_BYTES = 0
+        baseline = None
+        reference = None
+        ok = True
+
+        for workers in worker_counts(MAX_WORKERS):
+            extractor.EXTRACT_WORKERS = workers
+            t0 = time.perf_counter()
+            result = extractor.extract_emails(path)
+            elapsed = time.perf_counter() - t0
+
+            baseline = baseline or elapsed
+            print(
+                f"  workers={workers:<3} {elapsed:8.2f}s  "
+                f"{size / elapsed / 1e6:8.2f} MB/s  "
+                f"speedup x{baseline / elapsed:.2f}  "
+                f"creds={len(result['creds'])}",
+                flush=True
+            )
+
+            creds = {(c["email"], c["password"]) for c in result["creds"]}
+            if reference is None:
+                reference = creds
+            elif creds != reference:
+                print("  [!] result differs from serial scan", flush=True)
+                ok = False
+
+        return 0 if ok else 1
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Extractor throughput benchmark suite.
+
+Generates (or reuses) a synthetic corpus with scripts/bench_corpus.py and
+runs extract_emails() on every file in a fresh process, reporting MB/s,
+credential records/s, peak RSS and recall against the generator's
+expected in-scope set, plus totals per reader. Results are written as
+JSON so runs can be compared over time.
+
+Usage:
+    python scripts/bench_suite.py [--corpus DIR] [--size-mb N]
+                                  [--in-scope R] [--domain D] [--seed S]
+                                  [--workers N] [--json OUT]
+                                  [--compare PREVIOUS.json]
+"""
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+# Make sure the extractor (and, in a checkout, common/) is importable
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "common"))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+from bench_corpus import write_corpus, DEFAULT_DOMAIN
+
+# =========================================================
+# CASE RUNNER (fresh process per file)
+# =========================================================
+
+def _status_mb(field: str) -> float:
+    """A VmRSS / VmHWM style line of /proc/self/status, in MB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024  # kB
+    return 0.0
+
+def _reset_peak_rss() -> None:
+    # ru_maxrss carries the parent's high-water mark across fork and
+    # exec; VmHWM is per process and "5" resets it to the current RSS.
+    # Pool processes forked by the extraction (shards, PDF pages) are
+    # not included.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _run_case(path: str, conn) -> None:
+    sys.stdout = open(os.devnull, "w")
+    try:
+        import extractor
+
+        _reset_peak_rss()
+        base_rss = _status_mb("VmRSS")
+        t0 = time.perf_counter()
+        result = extractor.extract_emails(path)
+        elapsed = time.perf_counter() - t0
+        peak_rss = _status_mb("VmHWM")
+
+        conn.send({
+            "seconds": elapsed,
+            "peak_rss_mb": peak_rss,
+            "base_rss_mb": base_rss,
+            "found": [(c["email"], c["password"]) for c in result["creds"]],
+        })
+    except Exception as e:
+        conn.send({"error": repr(e)})
+    finally:
+        conn.close()
+
+def run_case(path: str) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_case, args=(path, child))
+    proc.start()
+    child.close()
+    try:
+        out = parent.recv()
+    except EOFError:
+        out = {"error": f"worker exited with {proc.exitcode}"}
+    proc.join()
+    return out
+
+# =========================================================
+# REPORTING
+# =========================================================
+
+def summarize(item: dict, out: dict) -> dict:
+    raw_bytes = item["raw_bytes"] or item["bytes"]
+    row = {
+        "name": item["name"],
+        "reader": item["kind"],
+        "file_bytes": item["bytes"],
+        "raw_bytes": raw_bytes,
+        "records": item["records"],
+        "expected": len(item["expected"]),
+    }
+    if "error" in out:
+        row["error"] = out["error"]
+        return row
+
+    secs = out["seconds"]
+    expected = {tuple(x) for x in item["expected"]}
+    found = {tuple(x) for x in out["found"]}
+
+    row.update({
+        "seconds": round(secs, 4),
+        "mb_per_s": round(raw_bytes / secs / 1e6, 3) if secs else None,
+        "records_per_s": round(item["records"] / secs, 1) if secs else None,
+        "peak_rss_mb": round(out["peak_rss_mb"], 1),
+        "rss_growth_mb": round(out["peak_rss_mb"] - out["base_rss_mb"], 1),
+        "found": len(found),
+        "recall": round(len(found & expected) / len(expected), 4) if expected else 1.0,
+        "unexpected": len(found - expected),
+    })
+    return row
+
+def per_reader(rows: list) -> dict:
+    readers = {}
+    for row in rows:
+        if "error" in row:
+            continue
+        r = readers.setdefault(row["reader"], {"files": 0, "raw_bytes": 0, "seconds": 0.0, "records": 0})
+        r["files"] += 1
+        r["raw_bytes"] += row["raw_bytes"]
+        r["seconds"] += row["seconds"]
+        r["records"] += row["records"]
+    for r in readers.values():
+        r["seconds"] = round(r["seconds"], 4)
+        r["mb_per_s"] = round(r["raw_bytes"] / r["seconds"] / 1e6, 3) if r["seconds"] else None
+    return readers
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def print_table(rows: list) -> None:
+    print(
+        f"{'file':<14} {'reader':<6} {'MB':>8} {'sec':>8} {'MB/s':>8} "
+        f"{'rec/s':>10} {'RSS MB':>7} {'recall':>7}",
+        flush=True
+    )
+    for row in rows:
+        if "error" in row:
+            print(f"{row['name']:<14} {row['reader']:<6} ERROR {row['error']}", flush=True)
+            continue
+        print(
+            f"{row['name']:<14} {row['reader']:<6} {row['raw_bytes'] / 1e6:8.2f} "
+            f"{row['seconds']:8.3f} {row['mb_per_s']:8.2f} {row['records_per_s']:10.0f} "
+            f"{row['peak_rss_mb']:7.1f} {row['recall']:7.3f}",
+            flush=True
+        )
+
+def print_comparison(current: dict, previous_path: str) -> None:
+    with open(previous_path, "r") as f:
+        previous = json.load(f)
+
+    before = {r["name"]: r for r in previous.get("cases", []) if "mb_per_s" in r}
+    print(f"\n[bench] vs {previous_path} ({previous.get('meta', {}).get('git', '?')})", flush=True)
+    for row in current["cases"]:
+        old = before.get(row["name"])
+        if not old or "mb_per_s" not in row or not old["mb_per_s"]:
+            continue
+        delta = (row["mb_per_s"] - old["mb_per_s"]) / old["mb_per_s"] * 100
+        print(
+            f"  {row['name']:<14} {old['mb_per_s']:8.2f} -> {row['mb_per_s']:8.2f} MB/s "
+            f"({delta:+.1f}%)",
+            flush=True
+        )
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="extractor benchmark suite")
+    ap.add_argument("--corpus", help="corpus directory (generated if missing)")
+    ap.add_argument("--size-mb", type=float, default=16)
+    ap.add_argument("--in-scope", type=float, default=0.01)
+    ap.add_argument("--domain", default=DEFAULT_DOMAIN)
+    ap.add_argument("--seed", type=int, default=1337)
+    ap.add_argument("--workers", type=int, default=1, help="EXTRACT_WORKERS for the runs")
+    ap.add_argument("--json", default="bench_results.json")
+    ap.add_argument("--compare", help="previous results JSON")
+    args = ap.parse_args()
+
+    tmp = None
+    corpus = args.corpus
+    if not corpus:
+        tmp = tempfile.TemporaryDirectory(prefix="extractor-bench-")
+        corpus = tmp.name
+
+    manifest_path = os.path.join(corpus, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        print(f"[bench] reusing corpus in {corpus}", flush=True)
+    else:
+        print(f"[bench] generating {args.size_mb} MB corpus in {corpus}", flush=True)
+        t0 = time.perf_counter()
+        manifest = write_corpus(corpus, args.size_mb, args.in_scope, args.domain, args.seed)
+        print(f"[bench] corpus ready in {time.perf_counter() - t0:.1f}s", flush=True)
+
+    # settings inherited by the spawned workers
+    os.environ["TARGET_DOMAIN"] = args.domain
+    os.environ["EXTRACT_CACHE_PATH"] = ""
+    os.environ["EXTRACT_WORKERS"] = str(args.workers)
+
+    rows = [summarize(item, run_case(item["path"])) for item in manifest]
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "size_mb": args.size_mb,
+            "in_scope": args.in_scope,
+            "domain": args.domain,
+            "seed": args.seed,
+            "workers": args.workers,
+        },
+        "cases": rows,
+        "readers": per_reader(rows),
+    }
+
+    print_table(rows)
+    print("\nper reader:", flush=True)
+    for kind, r in results["readers"].items():
+        print(f"  {kind:<6} {r['files']} file(s) {r['mb_per_s']} MB/s", flush=True)
+
+    with open(args.json, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[bench] results written to {args.json}", flush=True)
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    if tmp is not None:
+        tmp.cleanup()
+
+    failed = any("error" in r or r.get("recall", 1.0) < 1.0 for r in rows)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Per-file latency breakdown from pipeline trace events.
+
+Reads the JSON event lines the services write (common/tracing.py) from
+log files or stdin, groups them by trace id and prints, for every file,
+how long each stage took: Telegram post delay, download, forwarding to
+the extractor, job queue wait, extraction, batch scanner cron wait and
+delivery to the filter / n8n. Other log lines are ignored, and
+docker-compose prefixes ("filter-engine-1  | ") are stripped, so the
+output of `docker compose logs` can be piped in as is.
+
+Usage:
+    docker compose logs --no-color | python scripts/trace_report.py
+    python scripts/trace_report.py [LOG ...] [--trace ID] [--json]
+"""
+import sys
+import json
+import argparse
+
+# (column, header, event, field). The first event of that name with the
+# field wins; "delivered" can repeat and is handled apart.
+STAGES = [
+    ("telegram",   "tg delay", "received",        "telegram_delay_s"),
+    ("download",   "download", "downloaded",      "download_s"),
+    ("forward",    "forward",  "forwarded",       "forward_s"),
+    ("queue",      "queue",    "extract_started", "queue_wait_s"),
+    ("extract",    "extract",  "extracted",       "extract_s"),
+    ("cron_wait",  "cron",     "batch_scanned",   "cron_wait_s"),
+    ("batch_scan", "scan",     "batch_scanned",   "extract_s"),
+    ("batch_send", "to filter", "batch_sent",     "post_s"),
+    ("ingest",     "ingest",   "ingested",        "ingest_s"),
+]
+
+# =========================================================
+# PARSING
+# =========================================================
+
+def read_events(streams) -> dict:
+    """trace id -> its events, in time order."""
+    traces = {}
+    for stream in streams:
+        for line in stream:
+            start = line.find("{")
+            if start < 0:
+                continue
+            try:
+                record = json.loads(line[start:])
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or not record.get("event"):
+                continue
+            trace = record.get("trace")
+            if trace:
+                traces.setdefault(trace, []).append(record)
+
+    for events in traces.values():
+        events.sort(key=lambda e: e.get("ts", 0))
+    return traces
+
+# =========================================================
+# BREAKDOWN
+# =========================================================
+
+def breakdown(trace: str, events: list) -> dict:
+    row = {"trace": trace, "file": None}
+
+    for key, _, name, field in STAGES:
+        for e in events:
+            if e["event"] == name and isinstance(e.get(field), (int, float)):
+                row[key] = e[field]
+                break
+
+    # forwards that were retried: time spent in the scraper's spool
+    forwards = [e for e in events if e["event"] == "forwarded"]
+    if forwards:
+        row["forward"] = forwards[-1].get("forward_s")
+        row["forward_retry"] = forwards[-1].get("spool_wait_s")
+
+    # n8n: time held for the aggregation window / in the filter's spool,
+    # then the POST itself
+    delivered = [e for e in events if e["event"] == "delivered"]
+    if delivered:
+        last = delivered[-1]
+        row["n8n_wait"] = last.get("spool_wait_s", last.get("hold_s"))
+        row["n8n_post"] = last.get("post_s")
+    row["dead_lettered"] = any(e["event"] == "dead_lettered" for e in events)
+
+    for e in events:
+        row["file"] = row["file"] or e.get("file") or e.get("filepath") or e.get("path") or e.get("source")
+
+    received = next((e for e in events if e["event"] == "received"), None)
+    start = received["ts"] if received else events[0]["ts"]
+    row["total"] = events[-1]["ts"] - start
+    row["complete"] = any(
+        isinstance(e.get("status"), int) and e["status"] < 400 for e in delivered
+    )
+    row["services"] = sorted({e.get("service") or "?" for e in events})
+    return row
+
+COLUMNS = (
+    [(key, header) for key, header, _, _ in STAGES[:3]]
+    + [("forward_retry", "fwd spool")]
+    + [(key, header) for key, header, _, _ in STAGES[3:]]
+    + [("n8n_wait", "n8n wait"), ("n8n_post", "n8n post"), ("total", "total")]
+)
+
+def _fmt(value) -> str:
+    if not isinstance(value, (int, float)):
+        return "-"
+    if value >= 100:
+        return f"{value:.0f}s"
+    if value >= 1:
+        return f"{value:.1f}s"
+    return f"{value * 1000:.0f}ms"
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+def print_report(rows: list) -> None:
+    used = [(k, h) for k, h in COLUMNS if any(isinstance(r.get(k), (int, float)) for r in rows)]
+    widths = [max(len(h), 7) for _, h in used]
+
+    name_w = min(40, max([4] + [len(str(r["file"])) for r in rows]))
+    print(f"{'trace':16}  {'file':{name_w}}  " + "  ".join(f"{h:>{w}}" for (_, h), w in zip(used, widths)))
+    for r in rows:
+        name = str(r["file"] or "?")[-name_w:]
+        flag = " (dead letter)" if r["dead_lettered"] else "" if r["complete"] else " (incomplete)"
+        cells = "  ".join(f"{_fmt(r.get(k)):>{w}}" for (k, _), w in zip(used, widths))
+        print(f"{r['trace'][:16]:16}  {name:{name_w}}  {cells}{flag}")
+
+    print()
+    print(f"{len(rows)} trace(s), {sum(r['complete'] for r in rows)} delivered to n8n")
+    print(f"{'stage':10} {'files':>6} {'p50':>8} {'p95':>8} {'max':>8}")
+    for key, header in used:
+        values = [r[key] for r in rows if isinstance(r.get(key), (int, float))]
+        print(
+            f"{header:10} {len(values):>6} {_fmt(percentile(values, 50)):>8} "
+            f"{_fmt(percentile(values, 95)):>8} {_fmt(max(values)):>8}"
+        )
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("logs", nargs="*", help="log files (default: stdin)")
+    ap.add_argument("--trace", help="only this trace id (or prefix)")
+    ap.add_argument("--json", action="store_true", help="one JSON breakdown per line")
+    args = ap.parse_args()
+
+    streams = [open(p, "r", encoding="utf-8", errors="replace") for p in args.logs] or [sys.stdin]
+    traces = read_events(streams)
+
+    if args.trace:
+        traces = {t: e for t, e in traces.items() if t.startswith(args.trace)}
+    if not traces:
+        print("no trace events found", file=sys.stderr)
+        return 1
+
+    rows = sorted(
+        (breakdown(t, e) for t, e in traces.items()),
+        key=lambda r: traces[r["trace"]][0].get("ts", 0)
+    )
+
+    if args.json:
+        for r in rows:
+            print(json.dumps(r))
+    else:
+        print_report(rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
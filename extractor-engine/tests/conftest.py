@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the extractor modules and, in a checkout, common/ importable
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "common"))
+sys.path.insert(0, os.path.join(HERE, ".."))
@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+import extractor
+
+LINES = [
+    b"alice@example.edu:hunter2",
+    b"https://login.example.com/auth:bob.smith@example.edu:pa55word!",
+    b"mail.example.net:carol@example.org:c4r0l",
+    b"2024-01-01 12:00:00 INFO nothing to see here",
+    b"dave+tag@example.edu|d4v3",
+    b"eve@example.com;" + b"x" * 150,
+]
+
+def corpus(newline: bytes = b"\n", tail: bool = True) -> bytes:
+    data = newline.join(LINES * 20)
+    return data + newline if tail else data
+
+def scan(chunks) -> list:
+    found = []
+    for chunk in chunks:
+        found.extend(extractor.extract_all(chunk))
+    return sorted(found)
+
+# every size fits the longest line; shorter ones would have to cut a token
+@pytest.fixture(params=[170, 200, 251, 4096])
+def chunk_size(request, monkeypatch):
+    monkeypatch.setattr(extractor, "STREAM_CHUNK_SIZE", request.param)
+    return request.param
+
+def write(tmp_path, data: bytes) -> str:
+    path = tmp_path / "dump.txt"
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+@pytest.mark.parametrize("tail", [True, False])
+def test_mapped_chunks_keep_records_whole(tmp_path, chunk_size, newline, tail):
+    data = corpus(newline, tail)
+    chunks = [bytes(c) for c in extractor.read_raw_stream(write(tmp_path, data))]
+
+    assert b"".join(chunks) == data
+    for chunk in chunks[:-1]:
+        # every chunk but the last ends on whitespace, unless a single
+        # token is longer than a chunk
+        assert chunk[-1:].isspace() or len(chunk) == chunk_size
+    assert scan(chunks) == scan([data])
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"])
+@pytest.mark.parametrize("tail", [True, False])
+def test_buffered_chunks_keep_records_whole(chunk_size, newline, tail):
+    data = corpus(newline, tail)
+    chunks = list(extractor.stream_chunks(io.BytesIO(data)))
+
+    assert b"".join(chunks) == data
+    assert scan(chunks) == scan([data])
+
+def test_byte_ranges_cover_the_file(tmp_path, chunk_size):
+    data = corpus()
+    path = write(tmp_path, data)
+    ranges = extractor.shard_ranges(path, 5)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    chunks = [
+        bytes(c)
+        for start, end in ranges
+        for c in extractor.read_raw_stream(path, start, end)
+    ]
+    assert b"".join(chunks) == data
+    assert scan(chunks) == scan([data])
+
+def test_empty_file(tmp_path, chunk_size):
+    path = write(tmp_path, b"")
+
+    assert list(extractor.read_raw_stream(path)) == []
+    assert list(extractor.stream_chunks(io.BytesIO(b""))) == []
+    assert extractor.shard_ranges(path, 4) == []
+
+def test_record_on_the_chunk_edge(tmp_path, monkeypatch):
+    line = b"alice@example.edu:hunter2\n"
+    monkeypatch.setattr(extractor, "STREAM_CHUNK_SIZE", len(line) + 10)
+    data = line * 3
+
+    chunks = [bytes(c) for c in extractor.read_raw_stream(write(tmp_path, data))]
+
+    assert chunks == [line] * 3
+    assert scan(chunks) == [("alice@example.edu", "hunter2")] * 3
+
+def test_memoryview_and_bytes_scan_alike():
+    data = corpus(b"\r\n")
+    assert extractor.extract_all(memoryview(data)) == extractor.extract_all(data)
@@ -0,0 +1,69 @@
+import os
+import random
+
+import pytest
+
+import dedup
+from dedup import CredSet
+
+def pairs(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        (f"{rng.choice('abc')}{rng.randrange(40)}@ex{rng.randrange(3)}.edu", f"p{rng.randrange(5)}")
+        for _ in range(n)
+    ]
+
+def test_compact_matches_sorted_set(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_MAX_RUNS", 3)
+    data = pairs(213 * 5)
+    with CredSet(spill_dir=str(tmp_path)) as creds:
+        # 213 overlapping runs, merged down in several passes
+        for i in range(0, len(data), 5):
+            creds.update(data[i:i + 5])
+            creds.spill()
+        creds.update(data[:50])
+        assert len(creds._runs) == 213
+
+        assert list(creds) == sorted(set(data))
+        assert len(creds._runs) <= 3
+        assert creds.unique == len(set(data))
+        assert creds.added == len(data) + 50
+
+def test_spills_past_the_memory_ceiling(tmp_path):
+    data = pairs(500, seed=1)
+    key_size = max(len(dedup._key(*p)) for p in data) + dedup.ENTRY_OVERHEAD
+    # room for about ten keys
+    with CredSet(memory_mb=10 * key_size / (1024 * 1024), spill_dir=str(tmp_path)) as creds:
+        creds.update(data[:5])
+        assert creds._runs == []
+
+        creds.update(data[5:])
+        assert len(creds._runs) > 1
+        assert all(os.path.exists(p) for p in creds._runs)
+        assert list(creds) == sorted(set(data))
+        workdir = creds.workdir()
+
+    assert not os.path.exists(workdir)
+
+def test_empty_set_never_spills(tmp_path):
+    with CredSet(memory_mb=0.001, spill_dir=str(tmp_path)) as creds:
+        creds.update([])
+        creds.spill()
+        assert list(creds) == []
+        assert creds.unique == 0
+        assert creds.added == 0
+        assert creds._runs == []
+
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.parametrize("pair", [
+    ("alice@example.edu", "pass:word|with;separators"),
+    ("bob@exämple.edu", "pässwörd"),
+    ("carol@example.edu", ""),
+])
+def test_pairs_round_trip(tmp_path, pair):
+    path = tmp_path / "pairs"
+    with open(path, "wb") as f:
+        assert dedup.write_pairs(f, [pair]) == 1
+    with open(path, "rb") as f:
+        assert list(dedup.read_pairs(f)) == [pair]
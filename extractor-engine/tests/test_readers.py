@@ -0,0 +1,40 @@
+import io
+import gzip
+import zipfile
+
+import pytest
+
+import extractor
+
+DATA = b"alice@example.edu:hunter2\nbob@example.edu:pa55word\n"
+
+def scan(chunks) -> list:
+    return sorted(p for chunk in chunks for p in extractor.extract_all(chunk))
+
+def zipped(name: str, data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(name, data)
+    return buf.getvalue()
+
+@pytest.fixture
+def top_level_only(monkeypatch):
+    monkeypatch.setattr(extractor, "ARCHIVE_MAX_DEPTH", 0)
+
+def test_compressed_file_is_not_a_nesting_level(tmp_path, top_level_only):
+    path = tmp_path / "dump.txt.gz"
+    path.write_bytes(gzip.compress(DATA))
+
+    assert scan(extractor.read_compressed(str(path))) == scan([DATA])
+
+def test_compressed_archive_nests_like_the_archive(tmp_path, top_level_only):
+    path = tmp_path / "dump.zip.gz"
+    path.write_bytes(gzip.compress(zipped("dump.txt", DATA)))
+
+    assert scan(extractor.read_compressed(str(path))) == scan([DATA])
+
+def test_compressed_member_still_counts(top_level_only):
+    # only the file's own layer is free; a gz inside it is nested
+    data = gzip.compress(gzip.compress(DATA))
+
+    assert scan(extractor.read_unwrapped("dump.txt.gz.gz", io.BytesIO(data))) == []
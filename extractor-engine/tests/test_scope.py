@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import scope
+from scope import Scope, parse_rules
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "..", "config", "scope.txt.example")
+
+@pytest.fixture(autouse=True)
+def no_env_rules(monkeypatch):
+    for name in ("SCOPE_DOMAIN", "TARGET_DOMAIN", "SCOPE_EMAIL"):
+        monkeypatch.delenv(name, raising=False)
+
+def test_parse_rules_forms():
+    lines = [
+        "Example.EDU",
+        "@example.org   # trailing comment",
+        "domain:example.net",
+        "*.example.com",
+        "ceo@example.com",
+        "email: cfo@example.com",
+        "contains:j.doe",
+        "# comment",
+        "",
+        "bogus:rule",
+    ]
+    domains, emails, substrings = parse_rules(lines)
+    assert domains == ["example.edu", "@example.org", "example.net", "*.example.com"]
+    assert emails == ["ceo@example.com", "cfo@example.com"]
+    assert substrings == ["j.doe"]
+
+def test_plain_domain_is_exact():
+    s = Scope(domains=["example.edu", "@example.org"])
+    assert s.allowed("a@example.edu")
+    assert s.allowed("b@example.org")
+    assert not s.allowed("a@staff.example.edu")
+    assert not s.allowed("a@notexample.edu")
+
+def test_wildcard_covers_subdomains():
+    s = Scope(domains=["*.example.edu"])
+    assert s.allowed("a@example.edu")
+    assert s.allowed("a@staff.example.edu")
+    assert s.allowed("a@x.y.example.edu")
+    assert not s.allowed("a@badexample.edu")
+    assert not s.allowed("a@example.edu.evil.com")
+    assert not s.allowed("a@edu")
+
+def test_emails_and_substrings():
+    s = Scope(emails=["ceo@example.com"], substrings=["j.doe"])
+    assert s.allowed("ceo@example.com")
+    assert not s.allowed("cfo@example.com")
+    assert s.allowed("j.doe@anywhere.net")
+    assert not s.allowed("jdoe@anywhere.net")
+
+def test_no_rules_allow_everything():
+    assert Scope().allowed("anyone@anywhere.net")
+
+def test_digest_ignores_order_and_case():
+    a = Scope(domains=["example.edu", "*.example.net"], emails=["CEO@example.com"])
+    b = Scope(domains=["*.EXAMPLE.net", "@example.edu"], emails=["ceo@example.com"])
+    assert a.digest == b.digest
+
+def test_digest_tells_rules_apart():
+    digests = {
+        Scope().digest,
+        Scope(domains=["example.edu"]).digest,
+        Scope(domains=["*.example.edu"]).digest,
+        Scope(emails=["example.edu"]).digest,
+        Scope(substrings=["example.edu"]).digest,
+    }
+    assert len(digests) == 5
+
+def test_load_reads_file_and_env(tmp_path, monkeypatch):
+    path = tmp_path / "scope.txt"
+    path.write_text("*.example.edu\ncontains:j.doe\n")
+    monkeypatch.setenv("SCOPE_DOMAIN", "example.org")
+
+    s = scope.load(str(path))
+    assert s.allowed("a@staff.example.edu")
+    assert s.allowed("a@example.org")
+    assert s.allowed("j.doe@example.net")
+    assert not s.allowed("a@example.net")
+
+def test_missing_file_leaves_env_rules(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCOPE_DOMAIN", "example.org")
+    s = scope.load(str(tmp_path / "missing.txt"))
+    assert s.digest == Scope(domains=["example.org"]).digest
+
+def test_example_file_has_no_active_rules():
+    # copying it unchanged must not narrow the scope
+    with open(EXAMPLE, encoding="utf-8") as f:
+        assert parse_rules(f) == ([], [], [])
@@ -1,6 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
-import requests
+import sys
+import time
+import signal
+
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+import scope
+import spool
+import tracing
+from delivery import client, json_body, COALESCE_SECONDS
 
 app = Flask(__name__)
 
@@ -10,8 +19,33 @@ app = Flask(__name__)
 
 WEBHOOK = os.getenv("N8N_WEBHOOK")
 
+INGESTS = Counter(
+    "filter_ingest_requests_total",
+    "/ingest calls by outcome", ["result"]
+)
+INGEST_SECONDS = Histogram(
+    "filter_ingest_seconds",
+    "Time spent handling /ingest, forwarding included"
+)
+CREDS_RECEIVED = Counter(
+    "filter_creds_received_total",
+    "Credentials received on /ingest"
+)
+CREDS_ACCEPTED = Counter(
+    "filter_creds_accepted_total",
+    "Credentials that passed the sanity and scope checks"
+)
+
 print("=== Filter engine starting ===", flush=True)
 print(f"N8N_WEBHOOK = {'set' if WEBHOOK else 'not set'}", flush=True)
+print(f"Aggregation window = {COALESCE_SECONDS:g}s per source", flush=True)
+
+# SCOPE_DOMAIN / SCOPE_EMAIL / SCOPE_FILE (hot-reloaded), see common/scope.py
+scope.current()
+
+# n8n deliveries go through the durable spool (spool.py)
+if WEBHOOK:
+    spool.start(WEBHOOK)
 
 # =========================================================
 # HEALTH
@@ -26,8 +60,11 @@ def health():
 # =========================================================
 
 @app.route("/ingest", methods=["POST"])
+@INGEST_SECONDS.time()
 def ingest():
-    data = request.get_json(silent=True) or {}
+    started = time.perf_counter()
+    data = json_body(request)
+    trace = tracing.trace_from(request, data)
 
     source = data.get("source") or data.get("filepath") or "unknown"
 
@@ -38,22 +75,34 @@ def ingest():
     creds = data.get("creds") or []
 
     # ----------------------------
-    # Basic sanity only
+    # Sanity + scope
     # ----------------------------
 
+    allowed = scope.current().allowed
+
     clean_emails = [
         e for e in emails
         if isinstance(e, str) and "@" in e
+        and allowed(e.lower())
     ]
 
     clean_creds = [
         c for c in creds
         if isinstance(c, dict)
-        and c.get("email")
+        and isinstance(c.get("email"), str)
         and c.get("password")
+        and allowed(c["email"].lower())
     ]
 
+    CREDS_RECEIVED.inc(len(creds))
+    CREDS_ACCEPTED.inc(len(clean_creds))
+
     if not clean_emails and not clean_creds:
+        INGESTS.labels("no_data").inc()
+        tracing.event(
+            "ingested", trace, source=source, received=len(creds), accepted=0,
+            queued=False, ingest_s=time.perf_counter() - started
+        )
         return jsonify({
             "status": "no data",
             "source": source
@@ -80,41 +129,69 @@ def ingest():
             )
             payload["email_count"] = len(payload["emails"])
 
+    if trace:
+        payload["trace_id"] = trace
+
     # ----------------------------
-    # Forward to n8n
+    # Spool for n8n
     # ----------------------------
 
+    INGESTS.labels("accepted").inc()
+
     if WEBHOOK:
-        try:
-            resp = requests.post(
-                WEBHOOK,
-                json=payload,
-                timeout=15
-            )
-            print(
-                f"[filter] forwarded "
-                f"{payload.get('email_count', 0)} email(s) "
-                f"+ {payload.get('cred_count', 0)} cred(s) "
-                f"from {source} (status {resp.status_code})",
-                flush=True
-            )
-        except Exception as exc:
-            print(
-                f"[filter] forward failed for {source}: {exc}",
-                flush=True
-            )
+        # on disk before we answer; the spool workers deliver it
+        spool.enqueue(payload)
+        print(
+            f"[filter] queued "
+            f"{payload.get('email_count', 0)} email(s) "
+            f"+ {payload.get('cred_count', 0)} cred(s) "
+            f"from {source}",
+            flush=True
+        )
     else:
         print(
             "[filter] N8N_WEBHOOK not set, skipping forward",
             flush=True
         )
 
+    tracing.event(
+        "ingested", trace, source=source, received=len(creds),
+        accepted=len(clean_creds), queued=bool(WEBHOOK),
+        ingest_s=time.perf_counter() - started
+    )
+
     return jsonify(payload), 200
 
+# =========================================================
+# DELIVERY COUNTERS
+# =========================================================
+
+@app.route("/delivery/stats", methods=["GET"])
+def delivery_stats():
+    return jsonify(client.stats()), 200
+
+@app.route("/spool/stats", methods=["GET"])
+def spool_stats():
+    if not WEBHOOK:
+        return jsonify({"error": "N8N_WEBHOOK not set"}), 404
+    return jsonify(spool.stats()), 200
+
+# =========================================================
+# METRICS
+# =========================================================
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+
 # =========================================================
 # MAIN
 # =========================================================
 
 if __name__ == "__main__":
+    # docker stop sends SIGTERM: exit normally; whatever is not sent yet
+    # stays in the spool for the next start
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
     print("Starting Flask on 0.0.0.0:7000", flush=True)
     app.run(host="0.0.0.0", port=7000)
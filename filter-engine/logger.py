@@ -1,22 +1,29 @@
-import sys
-import time
+import tracing
 
 class Logger:
-    def _log(self, level: str, message: str):
-        ts = time.strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{ts}] [{level}] {message}", flush=True)
+    """
+    Writes one JSON line per message through the shared event log, so
+    logging never blocks the caller on stdout:
 
-    def debug(self, message: str):
-        self._log("DEBUG", message)
+      {"ts": ..., "service": "filter", "event": "log", "level": "INFO", "msg": "..."}
 
-    def info(self, message: str):
-        self._log("INFO", message)
+    A `trace` keyword ties a message to a pipeline trace id.
+    """
 
-    def warning(self, message: str):
-        self._log("WARN", message)
+    def _log(self, level: str, message: str, trace: str | None = None, **fields):
+        tracing.event("log", trace, level=level, msg=message, **fields)
 
-    def error(self, message: str):
-        self._log("ERROR", message)
+    def debug(self, message: str, **fields):
+        self._log("DEBUG", message, **fields)
+
+    def info(self, message: str, **fields):
+        self._log("INFO", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self._log("WARN", message, **fields)
+
+    def error(self, message: str, **fields):
+        self._log("ERROR", message, **fields)
 
 # singleton-style logger, matches `from logger import logger`
 logger = Logger()
@@ -1,6 +1,6 @@
 import os
-import requests
 from logger import logger
+from delivery import client
 
 # =========================================================
 # N8N NOTIFIER
@@ -42,7 +42,7 @@ def notify_n8n(
         payload["cred_count"] = len(creds)
 
     try:
-        requests.post(webhook, json=payload, timeout=10)
+        client.send(webhook, payload, timeout=10)
         logger.info(
             f"n8n notified for {source} "
             f"({payload.get('email_count', 0)} emails, "
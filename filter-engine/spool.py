@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from prometheus_client import Counter, Gauge
+
+import tracing
+from delivery import (
+    client,
+    Batch,
+    COALESCE_SECONDS,
+    COALESCE_MAX_SECONDS,
+    COALESCE_MAX_CREDS,
+)
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+SPOOL_PATH         = os.getenv("SPOOL_PATH", "/spool/outbound.sqlite")
+SPOOL_WORKERS      = int(os.getenv("SPOOL_WORKERS", "2"))
+SPOOL_TIMEOUT      = float(os.getenv("SPOOL_TIMEOUT", "15"))
+SPOOL_MAX_ATTEMPTS = int(os.getenv("SPOOL_MAX_ATTEMPTS", "12"))
+SPOOL_BACKOFF_BASE = float(os.getenv("SPOOL_BACKOFF_BASE", "2"))
+SPOOL_BACKOFF_MAX  = float(os.getenv("SPOOL_BACKOFF_MAX", "600"))
+
+# Rows merged into one delivery at most, whatever their cred counts
+SPOOL_MAX_ROWS     = int(os.getenv("SPOOL_MAX_ROWS", "500"))
+
+# How often idle workers look for due sources
+POLL_SECONDS = 0.5
+
+# =========================================================
+# METRICS
+# =========================================================
+
+SPOOL_SENT = Counter(
+    "filter_spool_deliveries_total",
+    "Spooled deliveries to n8n by outcome", ["result"]
+)
+SPOOL_DEPTH = Gauge(
+    "filter_spool_depth",
+    "Payloads waiting in the outbound spool"
+)
+SPOOL_OLDEST = Gauge(
+    "filter_spool_oldest_age_seconds",
+    "Age of the oldest payload in the outbound spool"
+)
+SPOOL_DEAD = Gauge(
+    "filter_spool_dead_letter",
+    "Payloads moved to the dead-letter table"
+)
+
+# =========================================================
+# DURABLE OUTBOUND SPOOL
+# =========================================================
+#
+# /ingest appends its payload to an SQLite spool and returns; nothing on
+# the request path waits for n8n. SPOOL_WORKERS threads drain it:
+#
+# - rows are grouped by source and sent as one merged payload (the
+#   aggregation window of delivery.py: a source is due once it has been
+#   quiet for COALESCE_SECONDS, held COALESCE_MAX_SECONDS, or reached
+#   COALESCE_MAX_CREDS creds)
+# - a source is only ever handled by one worker at a time
+# - one delivery takes at most COALESCE_MAX_CREDS creds and
+#   SPOOL_MAX_ROWS rows; a row without creds still counts as one
+# - rows leave the spool when n8n accepts them; connection errors, 408,
+#   429 and 5xx back off exponentially (SPOOL_BACKOFF_BASE, capped at
+#   SPOOL_BACKOFF_MAX)
+# - other 4xx, or SPOOL_MAX_ATTEMPTS failures, move the rows to the
+#   dead_letter table with the last error
+#
+# Rows survive restarts, so a stopped or crashed filter loses nothing
+# it has acknowledged.
+#
+# Each trace id in a sent batch gets a "delivered" (or "dead_lettered")
+# event with the time its row waited in the spool.
+#
+# Workers poll every POLL_SECONDS and /metrics reads the spool gauges on
+# every scrape, so both are answered from _sources, a per-source summary
+# kept in memory (updated by enqueue() and after each delivery, rebuilt
+# at start-up), rather than by aggregating the whole spool under the
+# lock enqueue() needs.
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_db = None
+_webhook = None
+_inflight = set()
+
+# source -> [first created, last created, weight, next attempt, rows,
+# creds], in the order sources arrived; weight is the creds, a row
+# without any as one
+_sources = {}
+_dead = 0
+
+def _open(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS spool ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " source TEXT NOT NULL,"
+        " payload TEXT NOT NULL,"
+        " creds INTEGER NOT NULL,"
+        " created REAL NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0,"
+        " next_attempt REAL NOT NULL DEFAULT 0,"
+        " last_error TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS spool_source ON spool (source, id)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS dead_letter ("
+        " id INTEGER PRIMARY KEY,"
+        " source TEXT NOT NULL,"
+        " payload TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL,"
+        " created REAL NOT NULL,"
+        " failed REAL NOT NULL,"
+        " error TEXT)"
+    )
+    conn.commit()
+    return conn
+
+def _weight(creds: int) -> int:
+    return max(creds, 1)
+
+def _refresh(source: str) -> None:
+    """Re-read one source's summary from its rows; the caller holds _lock."""
+    summary = _db.execute(
+        "SELECT MIN(created), MAX(created), SUM(MAX(creds, 1)), MAX(next_attempt),"
+        " COUNT(*), SUM(creds)"
+        " FROM spool WHERE source = ?",
+        (source,)
+    ).fetchone()
+    if summary[0] is None:
+        _sources.pop(source, None)
+    else:
+        _sources[source] = list(summary)
+
+def _retryable(status: int | None) -> bool:
+    return status is None or status in (408, 429) or status >= 500
+
+def enqueue(payload: dict) -> None:
+    """Durably queue a payload for n8n; returns once it is on disk."""
+    row = (
+        str(payload.get("source")),
+        json.dumps(payload, separators=(",", ":")),
+        len(payload.get("creds") or []),
+        time.time(),
+    )
+    source, _, creds, created = row
+    with _lock:
+        with _db:
+            _db.execute(
+                "INSERT INTO spool (source, payload, creds, created) VALUES (?, ?, ?, ?)",
+                row
+            )
+        summary = _sources.get(source)
+        if summary is None:
+            _sources[source] = [created, created, _weight(creds), 0.0, 1, creds]
+        else:
+            summary[1] = created
+            summary[2] += _weight(creds)
+            summary[4] += 1
+            summary[5] += creds
+    _wake.set()
+
+def _claim() -> tuple | None:
+    """Pick a due source nobody is sending and load its rows (oldest first)."""
+    now = time.time()
+    with _lock:
+        for source, (first, last, weight, next_attempt, _, _) in _sources.items():
+            if source in _inflight or next_attempt > now:
+                continue
+            if (
+                now - last < COALESCE_SECONDS
+                and now - first < COALESCE_MAX_SECONDS
+                and weight < COALESCE_MAX_CREDS
+            ):
+                continue
+
+            rows, total = [], 0
+            for row in _db.execute(
+                "SELECT id, payload, creds, attempts, created FROM spool"
+                " WHERE source = ? ORDER BY id LIMIT ?",
+                (source, SPOOL_MAX_ROWS)
+            ):
+                if rows and total + _weight(row[2]) > COALESCE_MAX_CREDS:
+                    break
+                rows.append(row)
+                total += _weight(row[2])
+
+            if not rows:
+                # emptied under us (e.g. by hand): forget it
+                _refresh(source)
+                return None
+
+            _inflight.add(source)
+            return source, rows
+
+    return None
+
+def _trace_events(name: str, traced: list, started: float, **fields) -> None:
+    for trace, created in traced:
+        tracing.event(name, trace, spool_wait_s=started - created, **fields)
+
+def _send(source: str, rows: list) -> None:
+    global _dead
+    batch = None
+    traced = []
+    for _, payload, _, _, created in rows:
+        payload = json.loads(payload)
+        if payload.get("trace_id"):
+            traced.append((payload["trace_id"], created))
+        if batch is None:
+            batch = Batch(payload, SPOOL_TIMEOUT)
+        else:
+            batch.add(payload)
+    merged = batch.payload()
+    ids = [(row[0],) for row in rows]
+    attempts = max(row[3] for row in rows) + 1
+
+    status, error = None, None
+    started = time.time()
+    try:
+        status = client.post(_webhook, merged, timeout=SPOOL_TIMEOUT).status_code
+        if status >= 400:
+            error = f"HTTP {status}"
+    except Exception as e:
+        error = str(e)
+    post_s = time.time() - started
+
+    if error is None:
+        with _lock:
+            with _db:
+                _db.executemany("DELETE FROM spool WHERE id = ?", ids)
+            _refresh(source)
+        SPOOL_SENT.labels("sent").inc()
+        _trace_events(
+            "delivered", traced, started, source=source, status=status,
+            post_s=post_s, attempts=attempts, merged=len(rows)
+        )
+        print(
+            f"[spool] sent {merged.get('cred_count', 0)} cred(s) from "
+            f"{len(rows)} payload(s) for {source} (status {status})",
+            flush=True
+        )
+        return
+
+    if not _retryable(status) or attempts >= SPOOL_MAX_ATTEMPTS:
+        now = time.time()
+        with _lock:
+            with _db:
+                _db.execute(
+                    "INSERT INTO dead_letter (id, source, payload, attempts, created, failed, error)"
+                    " SELECT id, source, payload, ?, created, ?, ? FROM spool"
+                    f" WHERE id IN ({','.join('?' * len(ids))})",
+                    [attempts, now, error] + [i for (i,) in ids]
+                )
+                _db.executemany("DELETE FROM spool WHERE id = ?", ids)
+            _refresh(source)
+            _dead += len(ids)
+        SPOOL_SENT.labels("dead_letter").inc()
+        _trace_events(
+            "dead_lettered", traced, started, source=source,
+            attempts=attempts, error=error
+        )
+        print(
+            f"[spool] dead-lettered {len(rows)} payload(s) for {source} "
+            f"after {attempts} attempt(s): {error}",
+            flush=True
+        )
+        return
+
+    delay = min(SPOOL_BACKOFF_MAX, SPOOL_BACKOFF_BASE * 2 ** (attempts - 1))
+    with _lock:
+        with _db:
+            _db.executemany(
+                "UPDATE spool SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                [(attempts, time.time() + delay, error, i) for (i,) in ids]
+            )
+        _refresh(source)
+    SPOOL_SENT.labels("retry").inc()
+    print(
+        f"[spool] delivery for {source} failed ({error}), "
+        f"retry {attempts} in {delay:.0f}s",
+        flush=True
+    )
+
+def _worker() -> None:
+    while True:
+        claimed = _claim()
+        if claimed is None:
+            _wake.wait(POLL_SECONDS)
+            _wake.clear()
+            continue
+
+        source, rows = claimed
+        try:
+            _send(source, rows)
+        except Exception as e:
+            print(f"[spool] worker error for {source}: {e}", flush=True)
+        finally:
+            with _lock:
+                _inflight.discard(source)
+
+def stats() -> dict:
+    """Spool counters from the in-memory summaries; no database access."""
+    now = time.time()
+    with _lock:
+        summaries = list(_sources.values())
+        dead = _dead
+        sending = len(_inflight)
+    oldest = min((s[0] for s in summaries), default=None)
+    return {
+        "depth": sum(s[4] for s in summaries),
+        "creds": sum(s[5] for s in summaries),
+        "oldest_age": now - oldest if oldest else 0.0,
+        "dead_letter": dead,
+        "sending": sending,
+    }
+
+def start(webhook: str) -> None:
+    """Open the spool and start the delivery workers."""
+    global _db, _webhook, _dead
+    _webhook = webhook
+    _db = _open(SPOOL_PATH)
+    with _lock:
+        for (source,) in _db.execute("SELECT source FROM spool GROUP BY source ORDER BY MIN(id)").fetchall():
+            _refresh(source)
+        _dead = _db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    pending = stats()
+    if pending["depth"]:
+        print(f"[spool] {pending['depth']} payload(s) left from a previous run", flush=True)
+
+    for _ in range(SPOOL_WORKERS):
+        threading.Thread(target=_worker, daemon=True).start()
+
+    SPOOL_DEPTH.set_function(lambda: stats()["depth"])
+    SPOOL_OLDEST.set_function(lambda: stats()["oldest_age"])
+    SPOOL_DEAD.set_function(lambda: stats()["dead_letter"])
@@ -0,0 +1,118 @@
+import time
+import asyncio
+import sqlite3
+import fnmatch
+
+from config import (
+    ADMIT_MIME_ALLOW,
+    ADMIT_MIME_DENY,
+    ADMIT_NAME_ALLOW,
+    ADMIT_NAME_DENY,
+    ADMIT_MAX_BYTES,
+    ADMIT_MIN_BYTES,
+    SEEN_DOCS_DB,
+    ADMIT_STATS_SECONDS,
+)
+
+# ----------------------------------------------------------
+# Pre-download admission policy
+# ----------------------------------------------------------
+#
+# check() looks only at msg.file metadata (MIME type, size, name) and the
+# Telegram document id, so rejected media never cost a download. Deny
+# rules win over allow rules; an empty allow list allows everything.
+# MIME and name rules are shell-style patterns ("video/*", "*.txt").
+# Document ids are recorded once a download succeeds, so a document
+# reposted across channels is fetched once. Skips are counted per reason
+# and logged every ADMIT_STATS_SECONDS.
+
+_db = None
+_stats = {}
+
+def _matches(value: str, patterns: list) -> bool:
+    value = (value or "").lower()
+    return any(fnmatch.fnmatchcase(value, p) for p in patterns)
+
+def _open_seen() -> sqlite3.Connection:
+    conn = sqlite3.connect(SEEN_DOCS_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS seen_documents ("
+        " doc_id INTEGER PRIMARY KEY,"
+        " seen REAL NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+def check(msg) -> str | None:
+    """Return why `msg`'s file should be skipped, or None to download it."""
+    f = msg.file
+    mime = f.mime_type or ""
+    name = f.name or ""
+    size = f.size
+
+    if msg.sticker:
+        return "sticker"
+    if ADMIT_MIME_DENY and _matches(mime, ADMIT_MIME_DENY):
+        return "mime_denied"
+    if ADMIT_MIME_ALLOW and not _matches(mime, ADMIT_MIME_ALLOW):
+        return "mime_not_allowed"
+    if ADMIT_NAME_DENY and _matches(name, ADMIT_NAME_DENY):
+        return "name_denied"
+    if ADMIT_NAME_ALLOW and not _matches(name, ADMIT_NAME_ALLOW):
+        return "name_not_allowed"
+    if size is not None and ADMIT_MAX_BYTES and size > ADMIT_MAX_BYTES:
+        return "too_large"
+    if size is not None and size < ADMIT_MIN_BYTES:
+        return "too_small"
+
+    doc = msg.document
+    if doc is not None and _db is not None:
+        row = _db.execute("SELECT 1 FROM seen_documents WHERE doc_id = ?", (doc.id,)).fetchone()
+        if row:
+            return "duplicate"
+
+    return None
+
+def skipped(msg, reason: str) -> None:
+    st = _stats.setdefault(reason, {"files": 0, "bytes": 0})
+    st["files"] += 1
+    st["bytes"] += msg.file.size or 0
+    print(
+        f"[i] Skipping {msg.id}_{msg.file.name} ({reason}, "
+        f"{msg.file.mime_type}, {msg.file.size} bytes)",
+        flush=True
+    )
+
+def mark_seen(msg) -> None:
+    if msg.document is None or _db is None:
+        return
+    with _db:
+        _db.execute(
+            "INSERT OR IGNORE INTO seen_documents (doc_id, seen) VALUES (?, ?)",
+            (msg.document.id, time.time())
+        )
+
+def stats() -> dict:
+    return {k: dict(v) for k, v in _stats.items()}
+
+async def _log_stats() -> None:
+    last = None
+    while True:
+        await asyncio.sleep(ADMIT_STATS_SECONDS)
+        current = stats()
+        if current == last:
+            continue
+        last = current
+        files = sum(v["files"] for v in current.values())
+        saved = sum(v["bytes"] for v in current.values())
+        reasons = ", ".join(f"{k}={v['files']}" for k, v in sorted(current.items()))
+        print(
+            f"[admission] skipped {files} file(s), {saved / 1e6:.1f} MB not downloaded ({reasons})",
+            flush=True
+        )
+
+def start():
+    """Open the seen-documents index and start the stats logger task."""
+    global _db
+    _db = _open_seen()
+    return asyncio.create_task(_log_stats())
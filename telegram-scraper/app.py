@@ -1,15 +1,29 @@
 import os
+import time
 import asyncio
-import requests
 import sqlite3
 
 from telethon import TelegramClient, events
-from telethon.errors import InviteHashExpiredError
 
-from config import API_ID, API_HASH, PHONE, CHANNELS, FORWARD_URL, DOWNLOAD_PATH
+import admission
+import backfill
+import channels
+import downloads
+import forwarder
+import streaming
+import tracing
+from config import API_ID, API_HASH, PHONE, CHANNELS, BACKFILL, CHANNEL_CACHE
 
 SESSION_FILE = "/session_storage/scraper.session"
 
+# Background tasks the loop holds only weakly; kept here until they finish
+_background = set()
+
+def _keep(*tasks) -> None:
+    for task in tasks:
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
 # ----------------------------------------------------------
 # Auto-fix locked/corrupt Telethon session
 # ----------------------------------------------------------
@@ -21,78 +35,101 @@ def ensure_session_clean():
         print("Session OK", flush=True)
     except Exception as e:
         print("Session damaged, resetting:", e, flush=True)
-        try:
-            os.remove(SESSION_FILE)
-        except Exception:
-            pass
+        # cached access hashes belong to the old session's account
+        for path in (SESSION_FILE, CHANNEL_CACHE):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
 
 
 ensure_session_clean()
 client = TelegramClient(SESSION_FILE, API_ID, API_HASH)
 
-# ----------------------------------------------------------
-# Validate channels before listening
-# ----------------------------------------------------------
-async def resolve_valid_channels(client, channels):
-    valid = []
-
-    for ch in channels:
-        try:
-            await client.get_input_entity(ch)
-            valid.append(ch)
-        except InviteHashExpiredError:
-            print(f"[!] Skipping expired invite link: {ch}", flush=True)
-        except Exception as e:
-            print(f"[!] Skipping invalid channel {ch}: {e}", flush=True)
-
-    return valid
-
 # ----------------------------------------------------------
 # MAIN SCRAPER
 # ----------------------------------------------------------
 async def start_scraper():
     await client.start(PHONE)
 
-    valid_channels = await resolve_valid_channels(client, CHANNELS)
+    # name -> input peer, resolved concurrently and cached on disk
+    valid_channels = await channels.resolve(client, CHANNELS)
 
     if not valid_channels:
         print("[!] No valid Telegram channels left to watch. Exiting.", flush=True)
         return
 
     print(f"Signed in and watching {len(valid_channels)} channels", flush=True)
-    print(f"Channels: {valid_channels}", flush=True)
+    print(f"Channels: {list(valid_channels)}", flush=True)
     print("Listening for new messages...", flush=True)
 
-    @client.on(events.NewMessage(chats=valid_channels))
-    async def handler(event):
-        msg = event.message
-        print(f"[i] New message received (id={msg.id})", flush=True)
+    async def downloaded(msg, filepath, trace=None):
+        admission.mark_seen(msg)
+        # downloads resumed after a restart start a new trace
+        forwarder.enqueue({"filepath": filepath, "trace_id": trace or tracing.new_trace_id()})
 
+    _keep(*forwarder.start(), admission.start())
+    downloads.start(client)
+    _keep(*await downloads.resume(downloaded))
+
+    async def process(msg, chat_id) -> bool:
+        """Handle one message; False if its file should be fetched again."""
         # ==========================================
         # FILE HANDLING ONLY
         # ==========================================
         if not msg.file:
-            return
-
-        filename = f"{msg.id}_{msg.file.name}"
-        filepath = os.path.join(DOWNLOAD_PATH, filename)
-
-        try:
-            await msg.download_media(filepath)
-            print(f"[+] Downloaded: {filepath}", flush=True)
-        except Exception as e:
-            print(f"[!] Download failed: {e}", flush=True)
-            return
-
-        try:
-            requests.post(
-                FORWARD_URL,
-                json={"filepath": filepath},
-                timeout=10
-            )
-            print(f"[+] Forwarded to extractor: {filepath}", flush=True)
-        except Exception as e:
-            print(f"[!] Extractor error: {e}", flush=True)
+            return True
+
+        # one trace id per file, carried to the extractor and the filter
+        trace = tracing.new_trace_id()
+        received = time.time()
+        tracing.event(
+            "received", trace, chat=chat_id, msg_id=msg.id, file=msg.file.name,
+            size=msg.file.size, telegram_delay_s=received - msg.date.timestamp()
+        )
+
+        reason = admission.check(msg)
+        if reason:
+            admission.skipped(msg, reason)
+            tracing.event("skipped", trace, reason=reason)
+            return True
+
+        # scan-while-downloading for large text dumps, if enabled; the
+        # upload starts once the download gets its slot
+        filepath = downloads.filepath_for(msg)
+        stream = streaming.open_for(msg, os.path.basename(filepath), trace)
+
+        # waits for a channel / global download slot
+        filepath = await downloads.fetch(msg, chat_id, stream)
+        tracing.event(
+            "downloaded", trace, filepath=filepath, ok=bool(filepath),
+            streamed=stream is not None, download_s=time.time() - received
+        )
+        if not filepath:
+            if stream:
+                stream.abort()
+            return False
+
+        if stream:
+            finishing = time.time()
+            if await stream.finish():
+                admission.mark_seen(msg)
+                tracing.event("streamed", trace, filepath=filepath, finish_s=time.time() - finishing)
+                print(f"[+] Streamed to extractor: {filepath} ({stream.result})", flush=True)
+                return True
+
+        await downloaded(msg, filepath, trace)
+        return True
+
+    @client.on(events.NewMessage(chats=list(valid_channels.values())))
+    async def handler(event):
+        msg = event.message
+        print(f"[i] New message received (id={msg.id})", flush=True)
+        await process(msg, event.chat_id)
+
+    # history of every channel, through the same path as live messages
+    if BACKFILL:
+        _keep(asyncio.create_task(backfill.run(client, valid_channels, process)))
 
     await client.run_until_disconnected()
 
@@ -0,0 +1,187 @@
+import time
+import asyncio
+import sqlite3
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import InputMessagesFilterDocument
+
+from ratelimit import RateLimiter
+from config import (
+    BACKFILL_DB,
+    BACKFILL_PARALLEL,
+    BACKFILL_DOWNLOADS,
+    BACKFILL_BATCH,
+    BACKFILL_RATE,
+    BACKFILL_RETRIES,
+)
+
+# ----------------------------------------------------------
+# Historical backfill
+# ----------------------------------------------------------
+#
+# Walks each channel's history oldest -> newest, asking Telegram for
+# document messages only, and hands every message to the same process()
+# coroutine the live handler uses (admission, download, forwarding).
+# BACKFILL_PARALLEL channels are walked at a time; their history requests
+# share one RateLimiter, and a flood wait seen by any of them pauses all.
+# Short flood waits are slept inside Telethon, which also holds back
+# later requests of the same kind.
+#
+# The last message id handled per channel is checkpointed in BACKFILL_DB,
+# so an interrupted backfill continues where it stopped, and a later run
+# only picks up what was posted while the scraper was down. Messages
+# already downloaded live are skipped as duplicates by admission.
+# Messages process() could not download are recorded as failed and
+# retried at the start of the next BACKFILL_RETRIES runs, so the
+# checkpoint can move past them without losing them.
+#
+# At most BACKFILL_DOWNLOADS backfill downloads run at once, which keeps
+# the rest of the MAX_DOWNLOADS slots free for live messages.
+
+_db = None
+_limiter = None
+_downloads = None
+
+def _open_checkpoints() -> sqlite3.Connection:
+    conn = sqlite3.connect(BACKFILL_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS checkpoints ("
+        " channel INTEGER PRIMARY KEY,"
+        " last_id INTEGER NOT NULL,"
+        " updated REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS failed ("
+        " channel INTEGER NOT NULL,"
+        " msg_id INTEGER NOT NULL,"
+        " attempts INTEGER NOT NULL,"
+        " updated REAL NOT NULL,"
+        " PRIMARY KEY (channel, msg_id))"
+    )
+    conn.commit()
+    return conn
+
+def checkpoint(channel: int) -> int:
+    row = _db.execute("SELECT last_id FROM checkpoints WHERE channel = ?", (channel,)).fetchone()
+    return row[0] if row else 0
+
+def _save_checkpoint(channel: int, last_id: int) -> None:
+    with _db:
+        _db.execute(
+            "INSERT OR REPLACE INTO checkpoints (channel, last_id, updated) VALUES (?, ?, ?)",
+            (channel, last_id, time.time())
+        )
+
+def _failed_ids(channel: int) -> list:
+    rows = _db.execute("SELECT msg_id FROM failed WHERE channel = ? ORDER BY msg_id", (channel,))
+    return [r[0] for r in rows]
+
+def _record(channel: int, msg_id: int, ok: bool) -> None:
+    with _db:
+        if ok:
+            _db.execute("DELETE FROM failed WHERE channel = ? AND msg_id = ?", (channel, msg_id))
+            return
+        _db.execute(
+            "INSERT INTO failed (channel, msg_id, attempts, updated) VALUES (?, ?, 1, ?)"
+            " ON CONFLICT (channel, msg_id) DO UPDATE SET attempts = attempts + 1, updated = excluded.updated",
+            (channel, msg_id, time.time())
+        )
+        _db.execute(
+            "DELETE FROM failed WHERE channel = ? AND msg_id = ? AND attempts > ?",
+            (channel, msg_id, BACKFILL_RETRIES)
+        )
+
+async def _request(call):
+    """Run one history request under the shared limiter, waiting out flood waits."""
+    while True:
+        await _limiter.wait()
+        try:
+            return await call()
+        except FloodWaitError as e:
+            print(f"[backfill] Flood wait of {e.seconds}s, pausing all channels", flush=True)
+            _limiter.pause(e.seconds)
+
+async def _handle(msg, chat_id, process) -> bool:
+    async with _downloads:
+        ok = await process(msg, chat_id)
+    _record(chat_id, msg.id, ok)
+    return ok
+
+async def _retry_failed(client, channel, entity, chat_id, process) -> None:
+    ids = _failed_ids(chat_id)
+    if not ids:
+        return
+    print(f"[backfill] {channel}: retrying {len(ids)} failed message(s)", flush=True)
+
+    for i in range(0, len(ids), BACKFILL_BATCH):
+        chunk = ids[i:i + BACKFILL_BATCH]
+        msgs = await _request(lambda: client.get_messages(entity, ids=chunk))
+        for msg_id, msg in zip(chunk, msgs):
+            if msg is None or not msg.file:
+                # deleted since: nothing left to fetch
+                _record(chat_id, msg_id, True)
+                continue
+            await _handle(msg, chat_id, process)
+
+async def _backfill_channel(client, channel, entity, process) -> None:
+    chat_id = await client.get_peer_id(entity)
+    await _retry_failed(client, channel, entity, chat_id, process)
+
+    # live ingestion takes over from the newest message at start-up
+    latest = await _request(lambda: client.get_messages(entity, limit=1))
+    if not latest:
+        return
+    upto = latest[0].id
+
+    last_id = checkpoint(chat_id)
+    if last_id >= upto:
+        print(f"[backfill] {channel}: up to date (id {last_id})", flush=True)
+        return
+    print(f"[backfill] {channel}: from id {last_id} to {upto}", flush=True)
+
+    handled = 0
+    while last_id < upto:
+        batch = await _request(lambda: client.get_messages(
+            entity,
+            limit=BACKFILL_BATCH,
+            offset_id=last_id,
+            reverse=True,
+            filter=InputMessagesFilterDocument,
+        ))
+        batch = [m for m in batch if m.id <= upto]
+        if not batch:
+            break
+
+        for msg in batch:
+            if msg.file:
+                if not await _handle(msg, chat_id, process):
+                    print(f"[backfill] {channel}: message {msg.id} failed, will retry", flush=True)
+                handled += 1
+            last_id = msg.id
+            _save_checkpoint(chat_id, last_id)
+
+    _save_checkpoint(chat_id, upto)
+    print(f"[backfill] {channel}: done, {handled} file message(s)", flush=True)
+
+async def run(client, channels, process) -> None:
+    """
+    Backfill `channels` (name -> input entity), feeding each file-bearing
+    message to `process(msg, chat_id)`, which returns False when the
+    message should be tried again.
+    """
+    global _db, _limiter, _downloads
+    _db = _open_checkpoints()
+    _limiter = RateLimiter(BACKFILL_RATE)
+    _downloads = asyncio.Semaphore(BACKFILL_DOWNLOADS)
+    slots = asyncio.Semaphore(BACKFILL_PARALLEL)
+
+    async def one(channel, entity):
+        async with slots:
+            try:
+                await _backfill_channel(client, channel, entity, process)
+            except Exception as e:
+                # the checkpoint keeps what was done; the next run continues
+                print(f"[!] Backfill of {channel} stopped: {e}", flush=True)
+
+    await asyncio.gather(*(one(ch, e) for ch, e in channels.items()))
+    print("[backfill] All channels done", flush=True)
@@ -0,0 +1,175 @@
+import time
+import asyncio
+import sqlite3
+
+from telethon.errors import (
+    FloodWaitError,
+    ChannelInvalidError,
+    ChannelPrivateError,
+    InviteHashExpiredError,
+    InviteHashInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+from ratelimit import RateLimiter
+from config import (
+    CHANNEL_CACHE,
+    CHANNEL_CACHE_TTL,
+    CHANNEL_DEAD_TTL,
+    CHANNEL_UNKNOWN_TTL,
+    RESOLVE_PARALLEL,
+    RESOLVE_RATE,
+)
+
+# Errors that mean the channel entry itself is bad, not the network.
+DEAD_ERRORS = (
+    ChannelInvalidError,
+    ChannelPrivateError,
+    InviteHashExpiredError,
+    InviteHashInvalidError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+
+# ----------------------------------------------------------
+# Channel resolution
+# ----------------------------------------------------------
+#
+# TARGET_CHANNELS entries are resolved to input peers concurrently
+# (RESOLVE_PARALLEL at a time, RESOLVE_RATE lookups per second, with a
+# shared pause on flood waits). Results are cached in CHANNEL_CACHE next
+# to the Telethon session: resolved peers for CHANNEL_CACHE_TTL and
+# known-dead entries (expired invites, unknown usernames...) for
+# CHANNEL_DEAD_TTL. Telethon raises a bare ValueError for entities it
+# cannot find, which also covers chats the account has not joined yet or
+# a session that is still catching up, so those are only cached for the
+# much shorter CHANNEL_UNKNOWN_TTL. A warm restart only resolves new or
+# stale entries. Transient failures are not cached and are retried at
+# the next start.
+
+_PEER_TYPES = {
+    "channel": (InputPeerChannel, "channel_id"),
+    "chat": (InputPeerChat, "chat_id"),
+    "user": (InputPeerUser, "user_id"),
+}
+
+def _open_cache() -> sqlite3.Connection:
+    conn = sqlite3.connect(CHANNEL_CACHE)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS channels ("
+        " channel TEXT PRIMARY KEY,"
+        " kind TEXT NOT NULL,"
+        " peer_id INTEGER,"
+        " access_hash INTEGER,"
+        " error TEXT,"
+        " resolved REAL NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+def _to_row(peer) -> tuple | None:
+    for kind, (cls, attr) in _PEER_TYPES.items():
+        if isinstance(peer, cls):
+            return kind, getattr(peer, attr), getattr(peer, "access_hash", None)
+    return None
+
+def _from_row(kind: str, peer_id: int, access_hash: int | None):
+    cls, _ = _PEER_TYPES[kind]
+    if cls is InputPeerChat:
+        return cls(peer_id)
+    return cls(peer_id, access_hash)
+
+def _cached(db, channels: list) -> tuple[dict, dict]:
+    """Fresh cache entries for `channels`: (name -> peer, name -> dead reason)."""
+    now = time.time()
+    peers, dead = {}, {}
+    marks = ",".join("?" * len(channels))
+    rows = db.execute(
+        f"SELECT channel, kind, peer_id, access_hash, error, resolved"
+        f" FROM channels WHERE channel IN ({marks})",
+        channels
+    ).fetchall()
+
+    for channel, kind, peer_id, access_hash, error, resolved in rows:
+        age = now - resolved
+        if kind == "dead":
+            if not CHANNEL_DEAD_TTL or age < CHANNEL_DEAD_TTL:
+                dead[channel] = error
+        elif kind == "unknown":
+            if age < CHANNEL_UNKNOWN_TTL:
+                dead[channel] = error
+        elif kind in _PEER_TYPES and (not CHANNEL_CACHE_TTL or age < CHANNEL_CACHE_TTL):
+            peers[channel] = _from_row(kind, peer_id, access_hash)
+
+    return peers, dead
+
+async def _lookup(client, limiter, channel: str):
+    while True:
+        await limiter.wait()
+        try:
+            return await client.get_input_entity(channel)
+        except FloodWaitError as e:
+            print(f"[!] Flood wait of {e.seconds}s while resolving channels", flush=True)
+            limiter.pause(e.seconds)
+
+async def resolve(client, channels: list) -> dict:
+    """Resolve `channels` to input peers; returns name -> peer for the valid ones."""
+    channels = list(dict.fromkeys(c for c in channels if c))
+    db = _open_cache()
+    try:
+        peers, dead = _cached(db, channels)
+        for channel, error in dead.items():
+            print(f"[!] Skipping known-dead channel {channel}: {error}", flush=True)
+
+        todo = [c for c in channels if c not in peers and c not in dead]
+        if peers or dead:
+            print(
+                f"[i] Channel cache: {len(peers)} resolved, {len(dead)} dead, "
+                f"{len(todo)} to resolve",
+                flush=True
+            )
+
+        limiter = RateLimiter(RESOLVE_RATE)
+        slots = asyncio.Semaphore(RESOLVE_PARALLEL)
+
+        async def one(channel):
+            async with slots:
+                try:
+                    peer = await _lookup(client, limiter, channel)
+                except DEAD_ERRORS as e:
+                    print(f"[!] Skipping invalid channel {channel}: {e}", flush=True)
+                    return channel, None, ("dead", None, None, str(e))
+                except ValueError as e:
+                    print(f"[!] Skipping unknown channel {channel}: {e}", flush=True)
+                    row = ("unknown", None, None, str(e)) if CHANNEL_UNKNOWN_TTL else None
+                    return channel, None, row
+                except Exception as e:
+                    print(f"[!] Skipping channel {channel} for now: {e}", flush=True)
+                    return channel, None, None
+
+            row = _to_row(peer)
+            if row is None:
+                # e.g. InputPeerSelf: usable, but not worth caching
+                return channel, peer, None
+            return channel, peer, row + (None,)
+
+        results = await asyncio.gather(*(one(c) for c in todo))
+
+        with db:
+            for channel, peer, row in results:
+                if peer is not None:
+                    peers[channel] = peer
+                if row is not None:
+                    db.execute(
+                        "INSERT OR REPLACE INTO channels"
+                        " (channel, kind, peer_id, access_hash, error, resolved)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (channel,) + row + (time.time(),)
+                    )
+    finally:
+        db.close()
+
+    # keep the configured order
+    return {c: peers[c] for c in channels if c in peers}
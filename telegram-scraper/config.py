@@ -6,3 +6,72 @@ PHONE = os.getenv("TELEGRAM_PHONE")
 CHANNELS = [c.strip() for c in os.getenv("TARGET_CHANNELS", "").split(",")]
 FORWARD_URL = os.getenv("FORWARD_URL")
 DOWNLOAD_PATH = "/files"
+PROCESSED_PATH = "/files/_processed"
+
+# Download manager: concurrent downloads overall / per channel, and
+# parallel segment fetchers per document
+MAX_DOWNLOADS = int(os.getenv("MAX_DOWNLOADS", "4"))
+MAX_DOWNLOADS_PER_CHANNEL = int(os.getenv("MAX_DOWNLOADS_PER_CHANNEL", "2"))
+DOWNLOAD_PARTS = int(os.getenv("DOWNLOAD_PARTS", "4"))
+DOWNLOAD_SEGMENT_BYTES = int(os.getenv("DOWNLOAD_SEGMENT_MB", "8")) * 1024 * 1024
+
+# Disk quota for /files in GB (0 = unlimited); the oldest files in
+# /files/_processed are evicted to make room for new downloads
+FILES_QUOTA_BYTES = int(float(os.getenv("FILES_QUOTA_GB", "0")) * 1024 ** 3)
+
+# Forwarding to the extractor: spooled on disk, sent by background workers
+FORWARD_SPOOL = os.getenv("FORWARD_SPOOL", "/files/.forward_spool.sqlite")
+FORWARD_WORKERS = int(os.getenv("FORWARD_WORKERS", "2"))
+FORWARD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", "10"))
+FORWARD_BACKOFF_BASE = float(os.getenv("FORWARD_BACKOFF_BASE", "2"))
+FORWARD_BACKOFF_MAX = float(os.getenv("FORWARD_BACKOFF_MAX", "300"))
+
+# Admission policy, checked on msg.file before downloading. Lists are
+# comma-separated shell-style patterns; an empty allow list allows all
+def _patterns(name: str, default: str = "") -> list:
+    return [p.strip().lower() for p in os.getenv(name, default).split(",") if p.strip()]
+
+ADMIT_MIME_ALLOW = _patterns("ADMIT_MIME_ALLOW")
+ADMIT_MIME_DENY = _patterns("ADMIT_MIME_DENY", "image/*,video/*,audio/*,application/x-tgsticker")
+ADMIT_NAME_ALLOW = _patterns("ADMIT_NAME_ALLOW")
+ADMIT_NAME_DENY = _patterns("ADMIT_NAME_DENY", "*.apk,*.exe,*.ipa,*.mp4,*.mkv")
+ADMIT_MAX_BYTES = int(float(os.getenv("ADMIT_MAX_MB", "0")) * 1024 * 1024)
+ADMIT_MIN_BYTES = int(os.getenv("ADMIT_MIN_BYTES", "0"))
+ADMIT_STATS_SECONDS = int(os.getenv("ADMIT_STATS_SECONDS", "300"))
+
+# Telegram document ids already downloaded (duplicate detection)
+SEEN_DOCS_DB = os.getenv("SEEN_DOCS_DB", "/files/.seen_documents.sqlite")
+
+# Scan-while-downloading: large text / compressed dumps are streamed to
+# the extractor as they download instead of being forwarded afterwards
+STREAM_TO_EXTRACTOR = os.getenv("STREAM_TO_EXTRACTOR", "0") == "1"
+STREAM_URL = os.getenv("STREAM_URL", "http://extractor-engine:8001/extract/stream")
+STREAM_MIN_BYTES = int(float(os.getenv("STREAM_MIN_MB", "32")) * 1024 * 1024)
+STREAM_MIME = _patterns(
+    "STREAM_MIME",
+    "text/*,application/gzip,application/x-gzip,application/x-bzip2,application/x-xz"
+)
+STREAM_TIMEOUT = float(os.getenv("STREAM_TIMEOUT", "300"))
+
+# Historical backfill (BACKFILL=1): channels walked in parallel, backfill
+# downloads at once (keep below MAX_DOWNLOADS to leave room for live
+# messages), messages per history request and history requests per second
+BACKFILL = os.getenv("BACKFILL", "0") == "1"
+BACKFILL_DB = os.getenv("BACKFILL_DB", "/files/.backfill.sqlite")
+BACKFILL_PARALLEL = int(os.getenv("BACKFILL_PARALLEL", "2"))
+BACKFILL_DOWNLOADS = int(os.getenv("BACKFILL_DOWNLOADS", "1"))
+BACKFILL_BATCH = int(os.getenv("BACKFILL_BATCH", "100"))
+BACKFILL_RATE = float(os.getenv("BACKFILL_RATE", "1"))
+# Runs a backfilled message whose download failed is retried in
+BACKFILL_RETRIES = int(os.getenv("BACKFILL_RETRIES", "3"))
+
+# Channel resolution at start-up: lookups in flight / per second, and the
+# on-disk cache kept next to the Telethon session (TTLs in days, 0 = keep)
+RESOLVE_PARALLEL = int(os.getenv("RESOLVE_PARALLEL", "8"))
+RESOLVE_RATE = float(os.getenv("RESOLVE_RATE", "5"))
+CHANNEL_CACHE = os.getenv("CHANNEL_CACHE", "/session_storage/channels.sqlite")
+CHANNEL_CACHE_TTL = float(os.getenv("CHANNEL_CACHE_TTL_DAYS", "7")) * 86400
+CHANNEL_DEAD_TTL = float(os.getenv("CHANNEL_DEAD_TTL_DAYS", "30")) * 86400
+# Entries Telethon could not find (ValueError) are retried sooner: hours,
+# 0 = at every start
+CHANNEL_UNKNOWN_TTL = float(os.getenv("CHANNEL_UNKNOWN_TTL_HOURS", "6")) * 3600
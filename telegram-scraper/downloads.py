@@ -0,0 +1,323 @@
+import os
+import json
+import asyncio
+
+from config import (
+    DOWNLOAD_PATH,
+    PROCESSED_PATH,
+    MAX_DOWNLOADS,
+    MAX_DOWNLOADS_PER_CHANNEL,
+    DOWNLOAD_PARTS,
+    DOWNLOAD_SEGMENT_BYTES,
+    FILES_QUOTA_BYTES,
+)
+
+# Largest upload.getFile request Telegram serves; segments are a multiple
+REQUEST_SIZE = 512 * 1024
+SEGMENT_BYTES = max(REQUEST_SIZE, DOWNLOAD_SEGMENT_BYTES // REQUEST_SIZE * REQUEST_SIZE)
+
+# How often a download waiting for disk space re-checks the quota
+QUOTA_RETRY_SECONDS = 10
+
+# ----------------------------------------------------------
+# Download manager
+# ----------------------------------------------------------
+#
+# Documents are written to "<file>.part" in fixed-size segments that
+# DOWNLOAD_PARTS tasks fetch in parallel; finished segments are recorded
+# in "<file>.part.json" together with the chat and message id. After a
+# restart, resume() re-fetches those messages and downloads only the
+# missing segments. Other media (photos) are small and fetched in one go.
+#
+# Downloads are bounded per channel and overall. Before a download
+# starts, its full size is reserved against FILES_QUOTA_BYTES, evicting
+# the oldest files in /files/_processed if needed.
+
+_client = None
+_slots = None
+_channel_slots = {}
+_space_lock = None
+_queued = set()
+_active = set()
+
+def _state_path(filepath: str) -> str:
+    return filepath + ".part.json"
+
+def _load_state(filepath: str) -> dict | None:
+    try:
+        with open(_state_path(filepath), "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _save_state(filepath: str, state: dict) -> None:
+    tmp = _state_path(filepath) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path(filepath))
+
+def _discard(filepath: str) -> None:
+    for p in (filepath + ".part", _state_path(filepath)):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+def disk_usage(root: str) -> int:
+    total = 0
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            try:
+                total += os.stat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _evict_processed(usage: int, needed: int) -> int:
+    """Delete the oldest processed files until `needed` bytes fit."""
+    try:
+        entries = [e for e in os.scandir(PROCESSED_PATH) if e.is_file()]
+    except FileNotFoundError:
+        return usage
+
+    # evicting everything would still not be enough: keep the files
+    if usage - sum(e.stat().st_size for e in entries) + needed > FILES_QUOTA_BYTES:
+        return usage
+
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+        if usage + needed <= FILES_QUOTA_BYTES:
+            break
+        size = entry.stat().st_size
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+        usage -= size
+        print(f"[quota] Evicted {entry.path} ({size} bytes)", flush=True)
+
+    return usage
+
+def _make_room(needed: int) -> bool:
+    """Whether `needed` more bytes fit the quota, evicting if need be."""
+    usage = disk_usage(DOWNLOAD_PATH)
+    if usage + needed > FILES_QUOTA_BYTES:
+        usage = _evict_processed(usage, needed)
+    return usage + needed <= FILES_QUOTA_BYTES
+
+async def _reserve(part: str, size: int) -> bool:
+    """
+    Make room for `size` bytes and preallocate the part file, waiting
+    while other downloads are in flight. False if it can never fit.
+    """
+    while True:
+        async with _space_lock:
+            existing = os.path.getsize(part) if os.path.exists(part) else 0
+            needed = size - existing
+
+            # /files is shared with the extractor, so usage is walked
+            # each time; off the event loop, as the tree can be large
+            fits = FILES_QUOTA_BYTES <= 0
+            if not fits:
+                loop = asyncio.get_running_loop()
+                fits = await loop.run_in_executor(None, _make_room, needed)
+
+            if fits:
+                with open(part, "ab") as f:
+                    f.truncate(size)
+                return True
+
+        # only this download is running: waiting frees nothing
+        if len(_active) <= 1:
+            return False
+        await asyncio.sleep(QUOTA_RETRY_SECONDS)
+
+async def _fetch_segment(doc, fd: int, index: int, size: int) -> None:
+    start = index * SEGMENT_BYTES
+    end = min(start + SEGMENT_BYTES, size)
+    chunks = -(-(end - start) // REQUEST_SIZE)
+
+    pos = start
+    async for chunk in _client.iter_download(
+        doc, offset=start, limit=chunks, request_size=REQUEST_SIZE, file_size=size
+    ):
+        os.pwrite(fd, chunk, pos)
+        pos += len(chunk)
+
+    if pos < end:
+        raise IOError(f"segment {index} ended early at {pos} of {end}")
+
+async def _download_document(msg, filepath: str, stream=None) -> bool:
+    size = msg.file.size
+    part = filepath + ".part"
+
+    state = _load_state(filepath)
+    if not state or state.get("size") != size or state.get("segment") != SEGMENT_BYTES:
+        _discard(filepath)
+        state = {
+            "chat": msg.chat_id,
+            "msg_id": msg.id,
+            "size": size,
+            "segment": SEGMENT_BYTES,
+            "done": [],
+        }
+
+    if not await _reserve(part, size):
+        print(f"[!] Disk quota exceeded, skipping {filepath} ({size} bytes)", flush=True)
+        _discard(filepath)
+        return False
+    _save_state(filepath, state)
+
+    done = set(state["done"])
+    pending = [i for i in range(-(-size // SEGMENT_BYTES)) if i not in done]
+    if done:
+        print(f"[i] Resuming {filepath}: {len(done)} segment(s) already on disk", flush=True)
+
+    fd = os.open(part, os.O_RDWR)
+    try:
+        # bytes [0, fed) have gone to the stream; segments finish out of
+        # order, so the stream only advances over a contiguous prefix
+        fed = 0
+        feed_lock = asyncio.Lock()
+
+        async def feed():
+            nonlocal fed
+            async with feed_lock:
+                while fed < size and fed // SEGMENT_BYTES in done:
+                    end = min(fed - fed % SEGMENT_BYTES + SEGMENT_BYTES, size)
+                    while fed < end:
+                        data = os.pread(fd, min(REQUEST_SIZE, end - fed), fed)
+                        await stream.write(data)
+                        fed += len(data)
+
+        async def worker():
+            while pending:
+                index = pending.pop(0)
+                await _fetch_segment(msg.document, fd, index, size)
+                done.add(index)
+                state["done"] = sorted(done)
+                _save_state(filepath, state)
+                if stream:
+                    await feed()
+
+        if stream:
+            await feed()
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(max(1, min(DOWNLOAD_PARTS, len(pending))))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # stop the other fetchers before the file is closed
+            for t in workers:
+                t.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+    finally:
+        os.close(fd)
+
+    os.replace(part, filepath)
+    os.remove(_state_path(filepath))
+    return True
+
+async def _download(msg, filepath: str, stream=None) -> bool:
+    if msg.document is not None and msg.file.size:
+        return await _download_document(msg, filepath, stream)
+
+    part = filepath + ".part"
+    if not await _reserve(part, msg.file.size or 0):
+        print(f"[!] Disk quota exceeded, skipping {filepath}", flush=True)
+        return False
+    await msg.download_media(part)
+    os.replace(part, filepath)
+    return True
+
+def filepath_for(msg) -> str:
+    # message ids are only unique within a chat
+    return os.path.join(DOWNLOAD_PATH, f"{msg.chat_id}_{msg.id}_{msg.file.name}")
+
+async def fetch(msg, channel, stream=None) -> str | None:
+    """
+    Download the file attached to `msg` under the channel and global
+    limits; returns the final path, or None if it was not downloaded.
+    With `stream` (an ExtractorStream), the file's bytes are also fed to
+    it in order as the download progresses; its upload is started once
+    the download has its slots.
+    """
+    filepath = filepath_for(msg)
+
+    if filepath in _queued:
+        return None
+
+    slots = _channel_slots.get(channel)
+    if slots is None:
+        slots = _channel_slots[channel] = asyncio.Semaphore(MAX_DOWNLOADS_PER_CHANNEL)
+
+    _queued.add(filepath)
+    try:
+        async with slots, _slots:
+            if stream:
+                stream.start()
+            _active.add(filepath)
+            try:
+                if not await _download(msg, filepath, stream):
+                    return None
+            except Exception as e:
+                print(f"[!] Download failed for {filepath}: {e}", flush=True)
+                return None
+            finally:
+                _active.discard(filepath)
+    finally:
+        _queued.discard(filepath)
+
+    print(f"[+] Downloaded: {filepath}", flush=True)
+    return filepath
+
+def start(client) -> None:
+    global _client, _slots, _space_lock
+    _client = client
+    _slots = asyncio.Semaphore(MAX_DOWNLOADS)
+    _space_lock = asyncio.Lock()
+
+async def resume(on_done) -> list:
+    """
+    Restart downloads interrupted by a previous run; `on_done(msg,
+    filepath)` is awaited for each one that completes. Returns the
+    started tasks.
+    """
+    tasks = []
+    for name in sorted(os.listdir(DOWNLOAD_PATH)):
+        if not name.endswith(".part.json"):
+            continue
+        filepath = os.path.join(DOWNLOAD_PATH, name[:-len(".part.json")])
+        state = _load_state(filepath)
+
+        msg = None
+        if state:
+            try:
+                msg = await _client.get_messages(state["chat"], ids=state["msg_id"])
+            except Exception as e:
+                # keep the partial file for the next restart
+                print(f"[!] Cannot resume {filepath}: {e}", flush=True)
+                continue
+        if msg is None or not msg.file:
+            _discard(filepath)
+            continue
+
+        # partial files named before the chat id was part of the name
+        if filepath_for(msg) != filepath:
+            for suffix in (".part", ".part.json"):
+                if os.path.exists(filepath + suffix):
+                    os.replace(filepath + suffix, filepath_for(msg) + suffix)
+
+        async def run(msg=msg, chat=state["chat"]):
+            path = await fetch(msg, chat)
+            if path:
+                await on_done(msg, path)
+
+        tasks.append(asyncio.create_task(run()))
+
+    if tasks:
+        print(f"[i] Resuming {len(tasks)} interrupted download(s)", flush=True)
+    return tasks
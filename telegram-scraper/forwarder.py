@@ -0,0 +1,120 @@
+import json
+import time
+import asyncio
+import sqlite3
+import functools
+
+import tracing
+from delivery import client
+from config import (
+    FORWARD_URL,
+    FORWARD_SPOOL,
+    FORWARD_WORKERS,
+    FORWARD_TIMEOUT,
+    FORWARD_BACKOFF_BASE,
+    FORWARD_BACKOFF_MAX,
+)
+
+# ----------------------------------------------------------
+# Non-blocking forwarder
+# ----------------------------------------------------------
+#
+# enqueue() records the payload in an SQLite spool and returns at once;
+# FORWARD_WORKERS tasks POST spooled payloads through the shared
+# delivery client on the default thread pool, so a slow extractor never
+# blocks the Telethon event loop. A payload leaves the spool once the
+# extractor accepts it (or rejects it outright with a 4xx). Anything
+# else is retried with capped exponential backoff, and whatever is still
+# spooled at shutdown is sent after the next start. A payload's
+# "trace_id" travels to the extractor as the X-Trace-Id header.
+
+_queue = None
+_db = None
+
+def _open_spool() -> sqlite3.Connection:
+    conn = sqlite3.connect(FORWARD_SPOOL)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS spool ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " payload TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0,"
+        " created REAL NOT NULL)"
+    )
+    conn.commit()
+    return conn
+
+def _retryable(status: int | None) -> bool:
+    # connection errors, 429 (queue full) and server errors
+    return status is None or status == 429 or status >= 500
+
+async def _send(payload: dict) -> int | None:
+    loop = asyncio.get_running_loop()
+    post = functools.partial(client.post, FORWARD_URL, payload, timeout=FORWARD_TIMEOUT)
+    try:
+        r = await loop.run_in_executor(None, post)
+    except Exception as e:
+        print(f"[!] Extractor error: {e}", flush=True)
+        return None
+    return r.status_code
+
+async def _worker() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        row_id, payload, attempts, created = await _queue.get()
+        started = time.time()
+        status = await _send(payload)
+        filepath = payload.get("filepath")
+        tracing.event(
+            "forwarded", payload.get("trace_id"), filepath=filepath, status=status,
+            attempt=attempts + 1, spool_wait_s=started - created,
+            forward_s=time.time() - started
+        )
+
+        if not _retryable(status):
+            with _db:
+                _db.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+            if status < 400:
+                print(f"[+] Forwarded to extractor: {filepath}", flush=True)
+            else:
+                print(f"[!] Extractor rejected {filepath} (HTTP {status}), dropped", flush=True)
+            continue
+
+        attempts += 1
+        with _db:
+            _db.execute("UPDATE spool SET attempts = ? WHERE id = ?", (attempts, row_id))
+        delay = min(FORWARD_BACKOFF_MAX, FORWARD_BACKOFF_BASE * 2 ** (attempts - 1))
+        print(
+            f"[!] Forward of {filepath} failed ({status or 'no response'}), "
+            f"retry {attempts} in {delay:.0f}s",
+            flush=True
+        )
+        loop.call_later(delay, _queue.put_nowait, (row_id, payload, attempts, created))
+
+def start() -> list:
+    """Open the spool, queue what a previous run left and start the workers."""
+    global _queue, _db
+    _queue = asyncio.Queue()
+    _db = _open_spool()
+
+    rows = _db.execute("SELECT id, payload, attempts, created FROM spool ORDER BY id").fetchall()
+    for row_id, payload, attempts, created in rows:
+        _queue.put_nowait((row_id, json.loads(payload), attempts, created))
+    if rows:
+        print(f"[i] {len(rows)} spooled forward(s) from a previous run", flush=True)
+
+    return [asyncio.create_task(_worker()) for _ in range(FORWARD_WORKERS)]
+
+def enqueue(payload: dict) -> None:
+    """Spool a payload for delivery to the extractor; never blocks on HTTP."""
+    created = time.time()
+    with _db:
+        cur = _db.execute(
+            "INSERT INTO spool (payload, created) VALUES (?, ?)",
+            (json.dumps(payload), created)
+        )
+    _queue.put_nowait((cur.lastrowid, payload, 0, created))
+
+def pending() -> int:
+    """Payloads still in the spool (queued, in flight or backing off)."""
+    return _db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
@@ -0,0 +1,30 @@
+import time
+import asyncio
+
+# ----------------------------------------------------------
+# Shared Telegram request pacing
+# ----------------------------------------------------------
+#
+# One RateLimiter is shared by all tasks making a kind of request
+# (history pages, channel resolution). wait() spaces calls `1 / rate`
+# seconds apart; pause() holds every caller back after a flood wait.
+
+class RateLimiter:
+    """Shared request pacing: `rate` calls per second, plus flood-wait pauses."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._resume = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next, self._resume)
+            self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def pause(self, seconds: float) -> None:
+        self._resume = max(self._resume, time.monotonic() + seconds)
@@ -0,0 +1,131 @@
+import queue
+import asyncio
+import fnmatch
+import threading
+
+from delivery import client
+from tracing import TRACE_HEADER
+from config import (
+    STREAM_TO_EXTRACTOR,
+    STREAM_URL,
+    STREAM_MIN_BYTES,
+    STREAM_MIME,
+    STREAM_TIMEOUT,
+)
+
+# Chunks buffered between the download and the upload thread
+STREAM_QUEUE_CHUNKS = 16
+
+_END = object()
+_ABORT = object()
+
+# ----------------------------------------------------------
+# Scan-while-downloading
+# ----------------------------------------------------------
+#
+# An ExtractorStream POSTs a file's bytes to the extractor's
+# /extract/stream endpoint (chunked transfer encoding) from a helper
+# thread while the download manager is still fetching it. The download
+# feeds bytes in file order; the extractor scans them as they arrive and
+# forwards in-scope hits before the download completes. If the upload
+# fails or the extractor answers 415 (not streamable), the caller falls
+# back to forwarding the finished file's path.
+#
+# The upload only starts (start()) once the download manager has given
+# the file a download slot, so a file queued behind others does not
+# hold an extractor request open while it waits.
+
+class ExtractorStream:
+    def __init__(self, source: str, trace: str | None = None):
+        self.source = source
+        self.trace = trace
+        self.failed = False
+        self.result = None
+        self._queue = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        self._thread = threading.Thread(target=self._upload, daemon=True)
+
+    def start(self) -> None:
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def _body(self):
+        while True:
+            data = self._queue.get()
+            if data is _END:
+                return
+            if data is _ABORT:
+                raise IOError("download aborted")
+            yield data
+
+    def _upload(self) -> None:
+        headers = {"Content-Type": "application/octet-stream"}
+        if self.trace:
+            headers[TRACE_HEADER] = self.trace
+        try:
+            r = client.session.post(
+                STREAM_URL,
+                params={"source": self.source},
+                data=self._body(),
+                headers=headers,
+                timeout=STREAM_TIMEOUT,
+            )
+            if r.status_code == 200:
+                self.result = r.json()
+            else:
+                self.failed = True
+                print(f"[!] Streaming {self.source}: HTTP {r.status_code}", flush=True)
+        except Exception as e:
+            self.failed = True
+            print(f"[!] Streaming {self.source} failed: {e}", flush=True)
+
+    def _put(self, item) -> None:
+        # blocking put that gives up once the upload thread has failed
+        while not self.failed and self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    async def write(self, data: bytes) -> None:
+        if self.failed:
+            return
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._put, data)
+
+    async def finish(self) -> bool:
+        """End the upload and wait for the extractor; True if it scanned the file."""
+        if self._thread.ident is None:
+            return False
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._put, _END)
+        await loop.run_in_executor(None, self._thread.join)
+        return not self.failed and self.result is not None
+
+    def abort(self) -> None:
+        self.failed = True
+        if self._thread.ident is None:
+            return
+        # make room so the upload thread is sure to see the abort
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put_nowait(_ABORT)
+
+def open_for(msg, source: str, trace: str | None = None) -> ExtractorStream | None:
+    """An ExtractorStream for `msg` if streaming mode applies to it."""
+    if not STREAM_TO_EXTRACTOR or msg.document is None:
+        return None
+
+    f = msg.file
+    if not f.size or f.size < STREAM_MIN_BYTES:
+        return None
+    mime = (f.mime_type or "").lower()
+    if STREAM_MIME and not any(fnmatch.fnmatchcase(mime, p) for p in STREAM_MIME):
+        return None
+
+    return ExtractorStream(source, trace)